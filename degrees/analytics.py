@@ -0,0 +1,210 @@
+import argparse
+import multiprocessing
+import random
+import struct
+from array import array
+from collections import deque
+
+import degrees
+
+# Sources searched together, one bit each in a 64-bit word
+WORD_SIZE = 64
+
+ANALYTICS_MAGIC = b"DEGSTAT1"
+
+# Magic, people, components, connected pairs, sum of distances, histogram length
+HEADER = struct.Struct("<8sqqqqq")
+
+# Graph analysed by forked workers; set by analyse
+_graph = None
+
+
+def components(graph):
+    """
+    Returns an array labelling each person with its connected component,
+    numbered from 0 in order of their lowest person index.
+    """
+    labels = array("i", [-1]) * graph.num_people
+    expanded = bytearray(graph.num_movies)
+    count = 0
+    for start in range(graph.num_people):
+        if labels[start] != -1:
+            continue
+        labels[start] = count
+        queue = deque([start])
+        while queue:
+            person = queue.popleft()
+            for movie in graph.movies_of(person):
+                if expanded[movie]:
+                    continue
+                expanded[movie] = 1
+                for star in graph.stars_of(movie):
+                    if labels[star] == -1:
+                        labels[star] = count
+                        queue.append(star)
+        count += 1
+    return labels
+
+
+def costar_degrees(graph):
+    """
+    Returns an array with the number of distinct co-stars of each person.
+    """
+    counts = array("i", [0]) * graph.num_people
+    for person in range(graph.num_people):
+        costars = set()
+        for movie in graph.movies_of(person):
+            costars.update(graph.stars_of(movie))
+        costars.discard(person)
+        counts[person] = len(costars)
+    return counts
+
+
+def multi_source_bfs(graph, sources):
+    """
+    Runs a breadth-first search from every source at once, with one bit
+    per source in each person's visited and frontier masks.
+
+    Returns (eccentricities, histogram) where histogram[d] counts the
+    (source, person) pairs at distance d >= 1.
+    """
+    visited = [0] * graph.num_people
+    frontier = {}
+    for bit, source in enumerate(sources):
+        visited[source] |= 1 << bit
+        frontier[source] = frontier.get(source, 0) | 1 << bit
+
+    eccentricities = [0] * len(sources)
+    histogram = [0]
+    depth = 0
+    while frontier:
+        depth += 1
+
+        # Gather the frontier bits reaching each movie, then spread them
+        # to its cast, so every movie is scanned once per level
+        movie_masks = {}
+        for person, mask in frontier.items():
+            for movie in graph.movies_of(person):
+                movie_masks[movie] = movie_masks.get(movie, 0) | mask
+        reached = {}
+        for movie, mask in movie_masks.items():
+            for star in graph.stars_of(movie):
+                new = mask & ~visited[star]
+                if new:
+                    reached[star] = reached.get(star, 0) | new
+
+        level = 0
+        pairs = 0
+        for person, new in reached.items():
+            visited[person] |= new
+            level |= new
+            pairs += new.bit_count()
+        if pairs:
+            histogram.append(pairs)
+        while level:
+            bit = level.bit_length() - 1
+            eccentricities[bit] = depth
+            level &= ~(1 << bit)
+        frontier = reached
+
+    return eccentricities, histogram
+
+
+def _search_batch(sources):
+    return sources, *multi_source_bfs(_graph, sources)
+
+
+def analyse(graph, sources=None, workers=None, batch_size=WORD_SIZE):
+    """
+    Returns (labels, eccentricities, costars, histogram) for `graph`.
+
+    Eccentricities are computed for `sources` (all people by default)
+    and are -1 for the rest; histogram[d] counts the ordered
+    (source, person) pairs at distance d. Batches of `batch_size`
+    sources are searched in parallel across `workers` processes.
+    """
+    global _graph
+    _graph = graph
+    if sources is None:
+        sources = range(graph.num_people)
+    sources = list(sources)
+    batches = [
+        sources[i:i + batch_size] for i in range(0, len(sources), batch_size)
+    ]
+
+    eccentricities = array("h", [-1]) * graph.num_people
+    histogram = [0]
+    context = multiprocessing.get_context("fork")
+    with context.Pool(workers) as pool:
+        for batch, batch_eccentricities, batch_histogram in pool.imap_unordered(
+                _search_batch, batches):
+            for source, eccentricity in zip(batch, batch_eccentricities):
+                eccentricities[source] = eccentricity
+            histogram.extend([0] * (len(batch_histogram) - len(histogram)))
+            for depth, pairs in enumerate(batch_histogram):
+                histogram[depth] += pairs
+
+    return components(graph), eccentricities, costar_degrees(graph), histogram
+
+
+def write_analytics(path, labels, eccentricities, costars, histogram):
+    """
+    Write analysis results to a binary file: a header, then per-person
+    component labels (int32), eccentricities (int16) and co-star degrees
+    (int32), then the distance histogram (int64).
+    """
+    pairs = sum(histogram)
+    distance_sum = sum(depth * count for depth, count in enumerate(histogram))
+    num_components = max(labels) + 1 if len(labels) else 0
+    with open(path, "wb") as f:
+        f.write(HEADER.pack(
+            ANALYTICS_MAGIC, len(labels), num_components, pairs, distance_sum,
+            len(histogram)))
+        f.write(labels)
+        f.write(eccentricities)
+        f.write(b"\0" * (-f.tell() % 4))
+        f.write(costars)
+        f.write(b"\0" * (-f.tell() % 8))
+        f.write(array("q", histogram))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compute components, eccentricities and degrees of separation")
+    parser.add_argument("directory")
+    parser.add_argument("output", help="binary file to write the results to")
+    parser.add_argument("--workers", type=int)
+    parser.add_argument("--sample", type=int,
+                        help="only search from this many random people")
+    parser.add_argument("--batch-size", type=int, default=WORD_SIZE)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    degrees.load_data(args.directory, compact=True)
+    graph = degrees.graph
+    sources = None
+    if args.sample:
+        rng = random.Random(args.seed)
+        sources = rng.sample(range(graph.num_people), min(args.sample, graph.num_people))
+
+    labels, eccentricities, costars, histogram = analyse(
+        graph, sources, args.workers, args.batch_size)
+    write_analytics(args.output, labels, eccentricities, costars, histogram)
+
+    sizes = {}
+    for label in labels:
+        sizes[label] = sizes.get(label, 0) + 1
+    pairs = sum(histogram)
+    distance_sum = sum(depth * count for depth, count in enumerate(histogram))
+    print(f"{graph.num_people} people in {len(sizes)} components, "
+          f"largest has {max(sizes.values(), default=0)}.")
+    if pairs:
+        print(f"Average degrees of separation: {distance_sum / pairs:.3f} "
+              f"over {pairs} connected pairs.")
+    print(f"Largest eccentricity: {max(eccentricities, default=-1)}.")
+    for depth, count in enumerate(histogram[1:], 1):
+        print(f"  {depth} degrees: {count} pairs")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+import csv
+from collections import OrderedDict, deque
+
+
+class SearchTree():
+    """
+    Breadth-first parent tree rooted at `source`.
+
+    The tree is grown lazily: path_to only expands states until the
+    target has been reached, and later calls resume from there.
+    """
+
+    def __init__(self, source, neighbors):
+        self.source = source
+        self.neighbors = neighbors
+        # Maps each reached state to (action, parent state)
+        self.parents = {source: (None, None)}
+        self.queue = deque([source])
+
+    def complete(self):
+        return len(self.queue) == 0
+
+    def expand(self):
+        """
+        Expand the next state in breadth-first order.
+        """
+        state = self.queue.popleft()
+        for action, neighbor in self.neighbors(state):
+            if neighbor not in self.parents:
+                self.parents[neighbor] = (action, state)
+                self.queue.append(neighbor)
+
+    def depth(self, state):
+        """
+        Returns the number of steps from the source to a reached state.
+        """
+        depth = 0
+        while state != self.source:
+            state = self.parents[state][1]
+            depth += 1
+        return depth
+
+    def affected_by(self, a, b):
+        """
+        Returns True if a new link between states `a` and `b` could
+        change the tree. Links between two unreached states cannot, as
+        they will be seen when the tree grows; neither can links between
+        reached states whose depths differ by at most one.
+        """
+        if a in self.parents and b in self.parents:
+            return abs(self.depth(a) - self.depth(b)) > 1
+        return a in self.parents or b in self.parents
+
+    def path_to(self, target):
+        """
+        Returns the shortest list of (action, state) pairs from the
+        source to `target`, or None if unreachable.
+        """
+        while target not in self.parents and self.queue:
+            self.expand()
+        if target not in self.parents:
+            return None
+
+        path = []
+        state = target
+        while state != self.source:
+            action, parent = self.parents[state]
+            path.append((action, state))
+            state = parent
+        path.reverse()
+        return path
+
+
+class TreeCache():
+    """
+    Least-recently-used cache of SearchTrees keyed by source.
+    """
+
+    def __init__(self, maxsize=16):
+        self.maxsize = maxsize
+        self.trees = OrderedDict()
+
+    def __len__(self):
+        return len(self.trees)
+
+    def __contains__(self, source):
+        return source in self.trees
+
+    def get(self, source, neighbors):
+        """
+        Returns the tree for `source`, building it if needed.
+        """
+        tree = self.trees.get(source)
+        if tree is None:
+            tree = SearchTree(source, neighbors)
+            self.trees[source] = tree
+            if len(self.trees) > self.maxsize:
+                self.trees.popitem(last=False)
+        else:
+            self.trees.move_to_end(source)
+        return tree
+
+    def discard(self, source):
+        self.trees.pop(source, None)
+
+    def invalidate(self, links):
+        """
+        Discard the trees affected by new (state, state) links and
+        return how many were discarded.
+        """
+        affected = [
+            source for source, tree in self.trees.items()
+            if any(tree.affected_by(a, b) for a, b in links)
+        ]
+        for source in affected:
+            del self.trees[source]
+        return len(affected)
+
+    def clear(self):
+        self.trees.clear()
+
+
+def read_pairs(filename):
+    """
+    Returns a list of (source, target) person ids from a two-column CSV.
+    """
+    with open(filename, encoding="utf-8", newline="") as f:
+        return [(row[0], row[1]) for row in csv.reader(f) if row]
+
+
+def group_by_source(pairs):
+    """
+    Returns (index, source, target) triples ordered so that queries
+    sharing a source are adjacent, keeping the first-seen source order.
+    """
+    groups = OrderedDict()
+    for index, (source, target) in enumerate(pairs):
+        groups.setdefault(source, []).append((index, source, target))
+    return [query for group in groups.values() for query in group]
+
+
+def run_batch(pairs, neighbors, cache):
+    """
+    Yields (index, source, target, path) for each (source, target) pair,
+    grouped by source so that each source's tree is built once.
+    """
+    for index, source, target in group_by_source(pairs):
+        tree = cache.get(source, neighbors)
+        yield index, source, target, tree.path_to(target)
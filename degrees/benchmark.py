@@ -0,0 +1,105 @@
+import argparse
+import csv
+import multiprocessing
+import random
+import resource
+import time
+
+import degrees
+from snapshot import write_snapshot
+from util import QueueFrontier, DequeQueueFrontier
+
+LOADERS = ["dict", "compact", "lazy", "snapshot"]
+
+# Search variants: name -> (strategy, shortest_path options)
+VARIANTS = {
+    "bfs/list": ("bfs", {"frontier_class": QueueFrontier}),
+    "bfs/deque": ("bfs", {"frontier_class": DequeQueueFrontier}),
+    "bidirectional": ("bidirectional", {}),
+    "hyperedge": ("hyperedge", {}),
+    "alt": ("alt", {}),
+}
+
+
+def percentile(values, fraction):
+    """
+    Returns the value at `fraction` of the sorted `values`.
+    """
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+def sample_pairs(directory, count, seed=0):
+    """
+    Returns `count` random (source, target) person id pairs.
+    """
+    with open(f"{directory}/people.csv", encoding="utf-8") as f:
+        person_ids = [row["id"] for row in csv.DictReader(f)]
+    rng = random.Random(seed)
+    return [(rng.choice(person_ids), rng.choice(person_ids)) for _ in range(count)]
+
+
+def measure(directory, loader, pairs, variants):
+    """
+    Load `directory` with `loader` and time each variant on `pairs`.
+    Runs in a fresh process so that peak RSS covers this loader only.
+    """
+    start = time.perf_counter()
+    if loader == "snapshot":
+        degrees.load_data(directory)
+        if degrees.graph is None:
+            raise Exception("no up-to-date snapshot")
+    else:
+        degrees.load_data(directory, compact=(loader == "compact"),
+                          lazy=(loader == "lazy"), snapshot=False)
+    load_time = time.perf_counter() - start
+    load_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    results = {}
+    for name in variants:
+        strategy, options = VARIANTS[name]
+        if strategy == "alt":
+            degrees.prepare_landmarks()
+        latencies = []
+        for source, target in pairs:
+            start = time.perf_counter()
+            degrees.shortest_path(source, target, strategy, **options)
+            latencies.append(time.perf_counter() - start)
+        results[name] = latencies
+
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return load_time, load_rss, peak_rss, results
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark loading and searching a degrees dataset")
+    parser.add_argument("directory")
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--loaders", nargs="+", choices=LOADERS, default=LOADERS)
+    parser.add_argument("--variants", nargs="+", choices=list(VARIANTS),
+                        default=list(VARIANTS))
+    args = parser.parse_args()
+
+    if "snapshot" in args.loaders:
+        write_snapshot(degrees.CompactGraph.from_csv(args.directory), args.directory)
+    pairs = sample_pairs(args.directory, args.queries, args.seed)
+
+    context = multiprocessing.get_context("fork")
+    for loader in args.loaders:
+        with context.Pool(1) as pool:
+            load_time, load_rss, peak_rss, results = pool.apply(
+                measure, (args.directory, loader, pairs, args.variants))
+        print(f"{loader}: load {load_time:.3f}s, "
+              f"RSS after load {load_rss / 1024:.1f} MiB, peak {peak_rss / 1024:.1f} MiB")
+        for name, latencies in results.items():
+            print(f"  {name:14} "
+                  f"p50 {1000 * percentile(latencies, 0.5):9.3f} ms  "
+                  f"p90 {1000 * percentile(latencies, 0.9):9.3f} ms  "
+                  f"p99 {1000 * percentile(latencies, 0.99):9.3f} ms  "
+                  f"max {1000 * max(latencies):9.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,27 @@
+import argparse
 import csv
+import os
 import sys
+import time
+from functools import partial
 
-from util import Node, StackFrontier, QueueFrontier
+from batch import TreeCache, read_pairs, run_batch
+from graph import CompactGraph
+from landmarks import (Landmarks, alt_search, build_graph_landmarks,
+                       load_landmarks, write_landmarks)
+from lookup import POLICIES, NameIndex
+from parallel import run_parallel
+from search import (SearchStats, all_shortest_paths, breadth_first_search,
+                    bidirectional_search, hyperedge_search, k_shortest_paths)
+from snapshot import SNAPSHOT_FILE, load_snapshot, write_snapshot
+
+# Search functions selectable by shortest_path(strategy=...)
+STRATEGIES = {
+    "bfs": breadth_first_search,
+    "bidirectional": bidirectional_search,
+    "alt": alt_search,
+    "hyperedge": hyperedge_search,
+}
 
 # Maps names to a set of corresponding person_ids
 names = {}
@@ -12,11 +32,51 @@ people = {}
 # Maps movie_ids to a dictionary of: title, year, stars (a set of person_ids)
 movies = {}
 
+# CompactGraph holding the same data, set when loading with compact=True
+# or from a snapshot
+graph = None
+
+# Recently used breadth-first trees, shared by batch queries
+TREE_CACHE_SIZE = 16
+tree_cache = TreeCache(TREE_CACHE_SIZE)
+
+# Landmark distances for the "alt" strategy, set by prepare_landmarks
+LANDMARK_COUNT = 8
+landmarks = None
 
-def load_data(directory):
+# Prefix and fuzzy name lookup, built on first use by get_name_index
+name_index = None
+
+
+def load_data(directory, compact=False, snapshot=True, lazy=False):
     """
     Load data from CSV files into memory.
+
+    With `compact`, people and movies are interned to integers and
+    stored in a CompactGraph instead of the dictionaries above.
+    With `lazy` (which implies `compact`), only adjacency and the name
+    index are loaded, and other metadata is read from the CSVs on demand.
+    If `snapshot` is set and `directory` has an up-to-date snapshot,
+    it is memory-mapped into a CompactGraph instead of parsing the CSVs.
     """
+    global graph, landmarks, name_index
+    tree_cache.clear()
+    landmarks = None
+    name_index = None
+    if snapshot:
+        graph = load_snapshot(directory)
+        if graph is not None:
+            return
+    if compact or lazy:
+        graph = CompactGraph.from_csv(directory, lazy=lazy)
+        return
+
+    # Drop any previously loaded dataset
+    graph = None
+    names.clear()
+    people.clear()
+    movies.clear()
+
     # Load people
     with open(f"{directory}/people.csv", encoding="utf-8") as f:
         reader = csv.DictReader(f)
@@ -52,97 +112,414 @@ def load_data(directory):
                 pass
 
 
+def load_delta(directory):
+    """
+    Add the rows of any people.csv, movies.csv and stars.csv files in
+    `directory` to the loaded data. Returns the number of new stars.
+    """
+    rows = {}
+    for kind in ["people", "movies", "stars"]:
+        rows[kind] = []
+        path = os.path.join(directory, f"{kind}.csv")
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                rows[kind] = list(csv.DictReader(f))
+    return apply_delta(rows["people"], rows["movies"], rows["stars"])
+
+
+def apply_delta(people_rows=(), movie_rows=(), star_rows=()):
+    """
+    Add people, movies and stars, given as rows like those of the CSV
+    files, to the loaded data in place. Returns the number of new stars.
+
+    Known ids and stars are skipped. Cached search trees and landmarks
+    that the new links could change are discarded; the rest are kept.
+    """
+    global landmarks
+    new_people = False
+    for row in people_rows:
+        if is_person(row["id"]):
+            continue
+        new_people = True
+        if graph is None:
+            people[row["id"]] = {"name": row["name"], "birth": row["birth"], "movies": set()}
+            names.setdefault(row["name"].lower(), set()).add(row["id"])
+        else:
+            graph.add_person(row["id"], row["name"], row["birth"])
+        if name_index is not None:
+            name_index.add(row["id"], row["name"], row["birth"])
+
+    for row in movie_rows:
+        if graph is None:
+            if row["id"] not in movies:
+                movies[row["id"]] = {"title": row["title"], "year": row["year"], "stars": set()}
+        elif row["id"] not in graph.movie_index:
+            graph.add_movie(row["id"], row["title"], row["year"])
+
+    # Links between each new star and the rest of the cast, as internal ids
+    added = 0
+    links = []
+    for row in star_rows:
+        if graph is None:
+            person, movie = row["person_id"], row["movie_id"]
+            if person not in people or movie not in movies:
+                continue
+            if movie in people[person]["movies"]:
+                continue
+            cast = list(movies[movie]["stars"])
+            people[person]["movies"].add(movie)
+            movies[movie]["stars"].add(person)
+        else:
+            person = graph.person_index.get(row["person_id"])
+            movie = graph.movie_index.get(row["movie_id"])
+            if person is None or movie is None:
+                continue
+            cast = list(graph.stars_of(movie))
+            if not graph.add_star(person, movie):
+                continue
+        added += 1
+        links.extend((person, other) for other in cast)
+
+    tree_cache.invalidate(links)
+    # Landmark tables do not cover new people, so they are rebuilt too
+    if landmarks is not None and (
+            new_people or any(landmarks.affected_by(a, b) for a, b in links)):
+        landmarks = None
+    return added
+
+
 def main():
-    if len(sys.argv) > 2:
-        sys.exit("Usage: python degrees.py [directory]")
-    directory = sys.argv[1] if len(sys.argv) == 2 else "large"
+    parser = argparse.ArgumentParser()
+    parser.add_argument("directory", nargs="?", default="large")
+    parser.add_argument("--compact", action="store_true",
+                        help="store the graph as integer CSR arrays")
+    parser.add_argument("--lazy", action="store_true",
+                        help="like --compact, but leave names, births, titles "
+                             "and years on disk until needed")
+    parser.add_argument("--strategy", choices=sorted(STRATEGIES),
+                        default="bfs", help="search algorithm to use")
+    parser.add_argument("--compile", action="store_true",
+                        help="write a binary snapshot of the CSVs and exit")
+    parser.add_argument("--batch", metavar="FILE",
+                        help="answer (source, target) person id pairs from a CSV")
+    parser.add_argument("--cache-size", type=int, default=TREE_CACHE_SIZE,
+                        help="number of search trees kept for --batch")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="number of processes answering --batch queries")
+    parser.add_argument("--landmarks", type=int, metavar="K",
+                        help="precompute K landmarks and use the alt strategy")
+    parser.add_argument("--delta", metavar="DIR",
+                        help="add the people, movies and stars CSVs in DIR to "
+                             "the loaded data, updating the snapshot if used")
+    parser.add_argument("--all-paths", type=int, metavar="N",
+                        help="print up to N equally short paths")
+    parser.add_argument("--k-paths", type=int, metavar="K",
+                        help="print the K shortest loopless paths")
+    parser.add_argument("--stats", action="store_true",
+                        help="print search statistics after the result")
+    parser.add_argument("--resolve", choices=POLICIES,
+                        help="resolve names without prompting; with --batch, "
+                             "the pairs are names instead of person ids")
+    args = parser.parse_args()
+
+    if args.compile:
+        compiled = CompactGraph.from_csv(args.directory)
+        print(f"Wrote {write_snapshot(compiled, args.directory)}")
+        return
 
     # Load data from files into memory
     print("Loading data...")
-    load_data(directory)
+    load_data(args.directory, compact=args.compact, lazy=args.lazy)
     print("Data loaded.")
 
-    source = person_id_for_name(input("Name: "))
+    if args.delta:
+        added = load_delta(args.delta)
+        print(f"Added {added} stars.")
+        if graph is not None and os.path.exists(os.path.join(args.directory, SNAPSHOT_FILE)):
+            write_snapshot(graph, args.directory)
+
+    if args.landmarks:
+        prepare_landmarks(args.landmarks, args.directory)
+        args.strategy = "alt"
+
+    if args.batch:
+        tree_cache.maxsize = args.cache_size
+        pairs = read_pairs(args.batch)
+        if args.resolve:
+            pairs = [
+                tuple(person_id_for_name(name, args.resolve) or name for name in pair)
+                for pair in pairs
+            ]
+        if args.workers > 1:
+            results = run_parallel(pairs, shortest_paths, args.workers)
+        else:
+            results = shortest_paths(pairs)
+        write_paths(results, sys.stdout)
+        return
+
+    source = person_id_for_name(input("Name: "), args.resolve)
     if source is None:
         sys.exit("Person not found.")
-    target = person_id_for_name(input("Name: "))
+    target = person_id_for_name(input("Name: "), args.resolve)
     if target is None:
         sys.exit("Person not found.")
 
-    path = shortest_path(source, target)
+    if landmarks is not None:
+        estimate = degrees_estimate(source, target)
+        if estimate is not None:
+            print(f"At most {estimate} degrees of separation.")
+
+    if args.all_paths or args.k_paths:
+        if args.all_paths:
+            paths = all_paths(source, target, limit=args.all_paths)
+        else:
+            paths = k_paths(source, target, args.k_paths)
+        found = False
+        for number, path in enumerate(paths, 1):
+            found = True
+            print(f"Path {number}:")
+            print_path(source, path)
+        if not found:
+            print("Not connected.")
+        return
+
+    stats = SearchStats() if args.stats else None
+    path = shortest_path(source, target, strategy=args.strategy, stats=stats)
 
     if path is None:
         print("Not connected.")
     else:
-        degrees = len(path)
-        print(f"{degrees} degrees of separation.")
-        path = [(None, source)] + path
-        for i in range(degrees):
-            person1 = people[path[i][1]]["name"]
-            person2 = people[path[i + 1][1]]["name"]
-            movie = movies[path[i + 1][0]]["title"]
-            print(f"{i + 1}: {person1} and {person2} starred in {movie}")
+        print_path(source, path)
+
+    if stats is not None:
+        print(stats.report())
+
+
+def print_path(source, path):
+    """
+    Print the degrees of separation and each step of a path from source.
+    """
+    degrees = len(path)
+    print(f"{degrees} degrees of separation.")
+    path = [(None, source)] + path
+    for i in range(degrees):
+        person1 = person_record(path[i][1])["name"]
+        person2 = person_record(path[i + 1][1])["name"]
+        movie = movie_record(path[i + 1][0])["title"]
+        print(f"{i + 1}: {person1} and {person2} starred in {movie}")
 
 
-def shortest_path(source, target):
+def shortest_path(source, target, strategy="bfs", stats=None, **options):
     """
     Returns the shortest list of (movie_id, person_id) pairs
     that connect the source to the target.
 
     If no possible path, returns None.
+    A SearchStats passed as `stats` is filled in by the search.
+    Extra `options` are passed on to the search function.
     """
+    start = time.perf_counter()
+    path = _search_path(source, target, strategy, stats=stats, **options)
+    if stats is not None:
+        stats.strategy = strategy
+        stats.path_length = None if path is None else len(path)
+        stats.elapsed = time.perf_counter() - start
+    return path
 
-    # TODO
-    algo = 'BFS'
-    explored = set()
-    start = Node(source, parent=None, action=None)
-    frontier = QueueFrontier() if algo == 'BFS' else StackFrontier()
-    frontier.add(start)
-    # Keep looping until solution found
-    while True:
 
-        # If nothing left in frontier, then no path
-        if frontier.empty():
-            raise Exception("no solution")
+def _search_path(source, target, strategy, **options):
+    """
+    Runs the search for shortest_path on the loaded data.
+    """
+    search = STRATEGIES[strategy]
+    if graph is None:
+        neighbors = neighbors_for_person
+        movies_of = movies_for_person
+        stars_of = stars_for_movie
+    else:
+        neighbors = graph.neighbors
+        movies_of = graph.movies_of
+        stars_of = graph.stars_of
 
-        # Choose a node from the frontier
-        node = frontier.remove()
+    if strategy == "alt":
+        search = partial(search, landmarks=prepare_landmarks())
+    elif strategy == "hyperedge":
+        search = partial(search, stars_of=stars_of)
+        neighbors = movies_of
 
-        # If node is the goal, then we have a solution
-        if node.state == target:
-            path = []
-            while node.parent is not None:
-                path.append((node.action, node.state))
-                node = node.parent
-            path.reverse()
-            return path
+    if graph is None:
+        return search(source, target, neighbors, **options)
 
-        # Mark node as explored
-        explored.add(node.state)
+    path = search(
+        graph.person_index[source], graph.person_index[target], neighbors,
+        **options
+    )
+    if path is None:
+        return None
+    return [(graph.movie_ids[m], graph.person_ids[p]) for m, p in path]
 
-        # Add neighbors to frontier
-        for movie_id, person_id in neighbors_for_person(node.state):
-            if not frontier.contains_state(person_id) and person_id not in explored:
-                child = Node(state=person_id, parent=node, action=movie_id)
-                if person_id == target:
-                    frontier.seed(child)
-                else:
-                    frontier.add(child)
 
+def all_paths(source, target, limit=None):
+    """
+    Yields every shortest list of (movie_id, person_id) pairs that
+    connect the source to the target, up to `limit` of them.
+    """
+    if graph is None:
+        yield from all_shortest_paths(source, target, neighbors_for_person, limit)
+        return
+    for path in all_shortest_paths(
+            graph.person_index[source], graph.person_index[target],
+            graph.neighbors, limit):
+        yield [(graph.movie_ids[m], graph.person_ids[p]) for m, p in path]
 
 
-def person_id_for_name(name):
+def k_paths(source, target, k):
+    """
+    Yields the `k` shortest loopless lists of (movie_id, person_id)
+    pairs that connect the source to the target, shortest first.
+    """
+    if graph is None:
+        yield from k_shortest_paths(source, target, neighbors_for_person, k)
+        return
+    for path in k_shortest_paths(
+            graph.person_index[source], graph.person_index[target],
+            graph.neighbors, k):
+        yield [(graph.movie_ids[m], graph.person_ids[p]) for m, p in path]
+
+
+def prepare_landmarks(k=None, directory=None):
+    """
+    Returns the landmarks for the loaded data, computing `k` of them
+    (LANDMARK_COUNT by default) unless already prepared. With a
+    CompactGraph and a `directory`, landmarks are read from and saved
+    to a file there.
+    """
+    global landmarks
+    if landmarks is not None and k is None:
+        return landmarks
+    k = k or LANDMARK_COUNT
+
+    if graph is None:
+        landmarks = Landmarks.build(
+            people, neighbors_for_person,
+            degree=lambda person_id: len(people[person_id]["movies"]), k=k
+        )
+        return landmarks
+
+    if directory is not None:
+        landmarks = load_landmarks(graph, directory, k)
+    if landmarks is None:
+        landmarks = build_graph_landmarks(graph, k)
+        if directory is not None:
+            write_landmarks(landmarks, graph, directory)
+    return landmarks
+
+
+def degrees_estimate(source, target):
+    """
+    Returns an upper bound on the degrees of separation between two
+    people from the landmark distances, or None if it is unknown.
+    """
+    landmarks = prepare_landmarks()
+    if graph is None:
+        return landmarks.upper_bound(source, target)
+    return landmarks.upper_bound(
+        graph.person_index[source], graph.person_index[target])
+
+
+def shortest_paths(pairs):
+    """
+    Yields (index, source, target, path) for each (source, target)
+    pair, where path is as returned by shortest_path.
+
+    Pairs are answered grouped by source, reusing cached search trees,
+    so results are not necessarily in input order.
+    """
+    # Unknown ids are answered up front
+    known = []
+    positions = []
+    for index, (source, target) in enumerate(pairs):
+        if is_person(source) and is_person(target):
+            known.append((source, target))
+            positions.append(index)
+        else:
+            yield index, source, target, None
+
+    if graph is None:
+        for i, source, target, path in run_batch(known, neighbors_for_person, tree_cache):
+            yield positions[i], source, target, path
+        return
+
+    interned = [
+        (graph.person_index[source], graph.person_index[target])
+        for source, target in known
+    ]
+    for i, source, target, path in run_batch(interned, graph.neighbors, tree_cache):
+        if path is not None:
+            path = [(graph.movie_ids[m], graph.person_ids[p]) for m, p in path]
+        yield positions[i], graph.person_ids[source], graph.person_ids[target], path
+
+
+def write_paths(results, f):
+    """
+    Write (index, source, target, path) results to `f` as CSV rows of
+    index, source, target, degrees and movie_id/person_id steps;
+    unconnected pairs have degrees -1.
+    """
+    writer = csv.writer(f)
+    for index, source, target, path in results:
+        if path is None:
+            writer.writerow([index, source, target, -1, ""])
+        else:
+            steps = " ".join(f"{movie_id}/{person_id}" for movie_id, person_id in path)
+            writer.writerow([index, source, target, len(path), steps])
+
+
+def get_name_index():
+    """
+    Returns the NameIndex over the loaded people, building it if needed.
+    """
+    global name_index
+    if name_index is None:
+        if graph is None:
+            name_index = NameIndex(
+                ((person_id, person["name"], person["birth"])
+                 for person_id, person in people.items()),
+                popularity=lambda person_id: len(people[person_id]["movies"])
+            )
+        else:
+            name_index = NameIndex(
+                zip(graph.person_ids, graph.person_names, graph.person_births),
+                popularity=lambda person_id: len(
+                    graph.movies_of(graph.person_index[person_id]))
+            )
+    return name_index
+
+
+def person_id_for_name(name, policy=None):
     """
     Returns the IMDB id for a person's name,
     resolving ambiguities as needed.
+
+    Without a `policy` the user is asked to pick between people sharing
+    the name; otherwise the name is resolved non-interactively by the
+    NameIndex with a policy from lookup.POLICIES.
     """
-    person_ids = list(names.get(name.lower(), set()))
+    if policy is not None:
+        return get_name_index().resolve(name, policy)
+
+    if graph is None:
+        person_ids = list(names.get(name.lower(), set()))
+    else:
+        person_ids = [
+            graph.person_ids[p] for p in graph.names.get(name.lower(), [])
+        ]
     if len(person_ids) == 0:
         return None
     elif len(person_ids) > 1:
         print(f"Which '{name}'?")
         for person_id in person_ids:
-            person = people[person_id]
+            person = person_record(person_id)
             name = person["name"]
             birth = person["birth"]
             print(f"ID: {person_id}, Name: {name}, Birth: {birth}")
@@ -162,6 +539,12 @@ def neighbors_for_person(person_id):
     Returns (movie_id, person_id) pairs for people
     who starred with a given person.
     """
+    if graph is not None:
+        return set(
+            (graph.movie_ids[m], graph.person_ids[p])
+            for m, p in graph.neighbors(graph.person_index[person_id])
+        )
+
     movie_ids = people[person_id]["movies"]
     neighbors = set()
     for movie_id in movie_ids:
@@ -170,5 +553,48 @@ def neighbors_for_person(person_id):
     return neighbors
 
 
+def movies_for_person(person_id):
+    """
+    Returns the movie_ids a person starred in.
+    """
+    return people[person_id]["movies"]
+
+
+def stars_for_movie(movie_id):
+    """
+    Returns the person_ids who starred in a movie.
+    """
+    return movies[movie_id]["stars"]
+
+
+def is_person(person_id):
+    """
+    Returns True if `person_id` is a loaded person.
+    """
+    if graph is None:
+        return person_id in people
+    return person_id in graph.person_index
+
+
+def person_record(person_id):
+    """
+    Returns a dictionary with the name and birth of a person.
+    """
+    if graph is None:
+        return people[person_id]
+    p = graph.person_index[person_id]
+    return {"name": graph.person_names[p], "birth": graph.person_births[p]}
+
+
+def movie_record(movie_id):
+    """
+    Returns a dictionary with the title and year of a movie.
+    """
+    if graph is None:
+        return movies[movie_id]
+    m = graph.movie_index[movie_id]
+    return {"title": graph.movie_titles[m], "year": graph.movie_years[m]}
+
+
 if __name__ == "__main__":
     main()
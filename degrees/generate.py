@@ -0,0 +1,85 @@
+import argparse
+import csv
+import itertools
+import os
+import random
+
+FIRST_NAMES = [
+    "Alex", "Anna", "Ben", "Chris", "Clara", "Dan", "Emma", "Frank", "Grace",
+    "Hugo", "Ivy", "Jack", "Julia", "Kevin", "Laura", "Leo", "Maria", "Mark",
+    "Nina", "Omar", "Paul", "Rose", "Sam", "Sara", "Tom", "Vera", "Will", "Zoe",
+]
+LAST_NAMES = [
+    "Adams", "Bacon", "Baker", "Brown", "Clark", "Cruise", "Davis", "Evans",
+    "Garcia", "Green", "Hall", "Hanks", "Hill", "Jones", "Khan", "King", "Lee",
+    "Lopez", "Miller", "Moore", "Nguyen", "Patel", "Reed", "Smith", "Stone",
+    "Taylor", "Turner", "Walker", "White", "Young",
+]
+WORDS = [
+    "Apollo", "Dark", "Days", "Echo", "Fall", "Few", "Good", "Heart", "Last",
+    "Long", "Men", "Night", "North", "Road", "Secret", "Shadow", "Summer",
+    "Time", "War", "Water", "Winter", "World",
+]
+
+
+def generate(directory, num_people, num_movies, mean_cast=4, alpha=0.8, seed=0):
+    """
+    Write people.csv, movies.csv and stars.csv to `directory`.
+
+    Cast sizes are exponential with mean `mean_cast`, and cast members
+    are drawn with Zipf-like weights 1 / rank ** `alpha`, so the number
+    of movies per person follows a power law as in IMDb.
+    """
+    rng = random.Random(seed)
+    os.makedirs(directory, exist_ok=True)
+
+    # Shuffle ids so that popularity does not follow id order
+    person_ids = rng.sample(range(1, 10 * num_people + 1), num_people)
+    movie_ids = rng.sample(range(1, 10 * num_movies + 1), num_movies)
+
+    with open(os.path.join(directory, "people.csv"), "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f, quoting=csv.QUOTE_NONNUMERIC)
+        writer.writerow(["id", "name", "birth"])
+        for person_id in person_ids:
+            name = f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+            birth = rng.randint(1900, 2005) if rng.random() < 0.8 else ""
+            writer.writerow([person_id, name, birth])
+
+    with open(os.path.join(directory, "movies.csv"), "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f, quoting=csv.QUOTE_NONNUMERIC)
+        writer.writerow(["id", "title", "year"])
+        for movie_id in movie_ids:
+            title = " ".join(rng.sample(WORDS, rng.randint(1, 3)))
+            writer.writerow([movie_id, title, rng.randint(1920, 2020)])
+
+    weights = itertools.accumulate(1 / (rank + 1) ** alpha for rank in range(num_people))
+    cum_weights = list(weights)
+    with open(os.path.join(directory, "stars.csv"), "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["person_id", "movie_id"])
+        for movie_id in movie_ids:
+            cast_size = 1 + int(rng.expovariate(1 / (mean_cast - 1)))
+            cast = rng.choices(range(num_people), cum_weights=cum_weights, k=cast_size)
+            for person in sorted(set(cast)):
+                writer.writerow([person_ids[person], movie_id])
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Generate a synthetic IMDb-like dataset for degrees.py")
+    parser.add_argument("directory")
+    parser.add_argument("--people", type=int, default=100000)
+    parser.add_argument("--movies", type=int, default=50000)
+    parser.add_argument("--mean-cast", type=float, default=4)
+    parser.add_argument("--alpha", type=float, default=0.8,
+                        help="power-law exponent of cast member popularity")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    if args.mean_cast <= 1:
+        parser.error("--mean-cast must be greater than 1")
+    generate(args.directory, args.people, args.movies,
+             args.mean_cast, args.alpha, args.seed)
+
+
+if __name__ == "__main__":
+    main()
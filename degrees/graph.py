@@ -0,0 +1,317 @@
+import csv
+from array import array
+
+
+class CompactGraph():
+    """
+    People and movies interned to dense integers.
+
+    Person -> movies and movie -> stars adjacency is kept in CSR form:
+    the movies of person `p` are person_movies[person_offsets[p]:
+    person_offsets[p + 1]], and likewise for the stars of a movie.
+    """
+
+    def __init__(self):
+        # Interned ids: index -> IMDB id, and IMDB id -> index
+        self.person_ids = []
+        self.person_index = {}
+        self.movie_ids = []
+        self.movie_index = {}
+
+        # Metadata, indexed by interned id
+        self.person_names = []
+        self.person_births = []
+        self.movie_titles = []
+        self.movie_years = []
+
+        # Maps lowercase names to a list of person indices
+        self.names = {}
+
+        # CSR adjacency
+        self.person_offsets = memoryview(array("i", [0]))
+        self.person_movies = memoryview(array("i"))
+        self.movie_offsets = memoryview(array("i", [0]))
+        self.movie_stars = memoryview(array("i"))
+
+        # Stars added since the CSR arrays were built, by person and by movie
+        self.added_movies = {}
+        self.added_stars = {}
+        self.num_added = 0
+
+    @classmethod
+    def from_csv(cls, directory, lazy=False):
+        """
+        Build a compact graph from people.csv, movies.csv and stars.csv.
+
+        With `lazy`, names, births, titles and years are not kept in
+        memory; they are read back from the CSVs by byte offset when
+        accessed. Lowercase names are still indexed for lookup.
+        """
+        graph = cls()
+
+        if lazy:
+            graph._load_lazy_metadata(directory)
+        else:
+            with open(f"{directory}/people.csv", encoding="utf-8") as f:
+                reader = csv.DictReader(f)
+                for row in reader:
+                    graph.add_person(row["id"], row["name"], row["birth"])
+
+            with open(f"{directory}/movies.csv", encoding="utf-8") as f:
+                reader = csv.DictReader(f)
+                for row in reader:
+                    graph.add_movie(row["id"], row["title"], row["year"])
+
+        # Stars referring to unknown people or movies are skipped
+        star_people = array("i")
+        star_movies = array("i")
+        with open(f"{directory}/stars.csv", encoding="utf-8") as f:
+            reader = csv.DictReader(f)
+            for row in reader:
+                p = graph.person_index.get(row["person_id"])
+                m = graph.movie_index.get(row["movie_id"])
+                if p is None or m is None:
+                    continue
+                star_people.append(p)
+                star_movies.append(m)
+
+        graph.set_stars(star_people, star_movies)
+        return graph
+
+    def _load_lazy_metadata(self, directory):
+        """
+        Intern people and movies, recording the byte offset of each
+        CSV row instead of its metadata.
+        """
+        path = f"{directory}/people.csv"
+        records = csv_records(path)
+        columns = next(records)[1]
+        person_id = columns.index("id")
+        name = columns.index("name")
+        offsets = array("q")
+        for offset, row in records:
+            p = len(self.person_ids)
+            self.person_ids.append(row[person_id])
+            self.person_index[self.person_ids[p]] = p
+            self.names.setdefault(row[name].lower(), []).append(p)
+            offsets.append(offset)
+        self.person_names = CSVColumn(path, offsets, name)
+        self.person_births = CSVColumn(path, offsets, columns.index("birth"))
+
+        path = f"{directory}/movies.csv"
+        records = csv_records(path)
+        columns = next(records)[1]
+        movie_id = columns.index("id")
+        offsets = array("q")
+        for offset, row in records:
+            m = len(self.movie_ids)
+            self.movie_ids.append(row[movie_id])
+            self.movie_index[self.movie_ids[m]] = m
+            offsets.append(offset)
+        self.movie_titles = CSVColumn(path, offsets, columns.index("title"))
+        self.movie_years = CSVColumn(path, offsets, columns.index("year"))
+
+    def add_person(self, person_id, name, birth):
+        """
+        Intern a person and return its index.
+        """
+        p = len(self.person_ids)
+        self.person_ids.append(person_id)
+        self.person_index[person_id] = p
+        self.person_names.append(name)
+        self.person_births.append(birth)
+        self.names.setdefault(name.lower(), []).append(p)
+        return p
+
+    def add_movie(self, movie_id, title, year):
+        """
+        Intern a movie and return its index.
+        """
+        m = len(self.movie_ids)
+        self.movie_ids.append(movie_id)
+        self.movie_index[movie_id] = m
+        self.movie_titles.append(title)
+        self.movie_years.append(year)
+        return m
+
+    def add_star(self, p, m):
+        """
+        Record that person `p` starred in movie `m` without rebuilding
+        the CSR arrays. Returns False if the star was already known.
+        """
+        if m in self.movies_of(p):
+            return False
+        self.added_movies.setdefault(p, []).append(m)
+        self.added_stars.setdefault(m, []).append(p)
+        self.num_added += 1
+        return True
+
+    def set_stars(self, star_people, star_movies):
+        """
+        Build both CSR adjacencies from parallel arrays of
+        (person index, movie index) pairs.
+        """
+        offsets, indices = build_csr(
+            len(self.person_ids), star_people, star_movies)
+        self.person_offsets = memoryview(offsets)
+        self.person_movies = memoryview(indices)
+
+        offsets, indices = build_csr(
+            len(self.movie_ids), star_movies, star_people)
+        self.movie_offsets = memoryview(offsets)
+        self.movie_stars = memoryview(indices)
+        self.added_movies = {}
+        self.added_stars = {}
+        self.num_added = 0
+
+    def compact(self):
+        """
+        Merge added stars into freshly built CSR arrays.
+        """
+        star_people = array("i")
+        star_movies = array("i")
+        for p in range(self.num_people):
+            for m in self.movies_of(p):
+                star_people.append(p)
+                star_movies.append(m)
+        self.set_stars(star_people, star_movies)
+
+    @property
+    def num_people(self):
+        return len(self.person_ids)
+
+    @property
+    def num_movies(self):
+        return len(self.movie_ids)
+
+    @property
+    def num_stars(self):
+        return len(self.person_movies) + self.num_added
+
+    def movies_of(self, p):
+        """
+        Returns the movie indices person `p` starred in.
+        """
+        if p + 1 < len(self.person_offsets):
+            movies = self.person_movies[self.person_offsets[p]:self.person_offsets[p + 1]]
+        else:
+            movies = ()
+        if p in self.added_movies:
+            return list(movies) + self.added_movies[p]
+        return movies
+
+    def stars_of(self, m):
+        """
+        Returns the person indices who starred in movie `m`.
+        """
+        if m + 1 < len(self.movie_offsets):
+            stars = self.movie_stars[self.movie_offsets[m]:self.movie_offsets[m + 1]]
+        else:
+            stars = ()
+        if m in self.added_stars:
+            return list(stars) + self.added_stars[m]
+        return stars
+
+    def neighbors(self, p):
+        """
+        Yields (movie index, person index) pairs for people
+        who starred with person `p`.
+        """
+        for m in self.movies_of(p):
+            for q in self.stars_of(m):
+                yield m, q
+
+
+class CSVColumn():
+    """
+    Sequence of one column of a CSV file, read from disk on access
+    using the byte offset of each row.
+    """
+
+    def __init__(self, path, offsets, column):
+        self.path = path
+        self.offsets = offsets
+        self.column = column
+        # Values appended after loading
+        self.added = []
+
+    def __len__(self):
+        return len(self.offsets) + len(self.added)
+
+    def __getitem__(self, i):
+        if i >= len(self.offsets):
+            return self.added[i - len(self.offsets)]
+        # Opened per access, so that forked processes never share a file position
+        with open(self.path, "rb") as f:
+            f.seek(self.offsets[i])
+            _, row = next(csv_records(f))
+        return row[self.column]
+
+    def __iter__(self):
+        """
+        Yields every value in order, scanning the file once.
+        """
+        if len(self.offsets):
+            with open(self.path, "rb") as f:
+                f.seek(self.offsets[0])
+                records = csv_records(f)
+                for _ in range(len(self.offsets)):
+                    yield next(records)[1][self.column]
+        yield from self.added
+
+    def append(self, value):
+        self.added.append(value)
+
+
+def csv_records(source):
+    """
+    Yields (byte offset, fields) for each CSV record in a path or a
+    binary file, starting at its current position. Blank lines are
+    skipped, as csv.DictReader does.
+    """
+    if isinstance(source, str):
+        with open(source, "rb") as f:
+            yield from csv_records(f)
+        return
+
+    offset = source.tell()
+    start = offset
+    pending = b""
+    for line in source:
+        if not pending:
+            start = offset
+        pending += line
+        offset += len(line)
+        # Quoted fields may contain newlines
+        if pending.count(b'"') % 2:
+            continue
+        fields = next(csv.reader([pending.decode("utf-8")]))
+        pending = b""
+        if fields:
+            yield start, fields
+
+
+def build_csr(num_rows, rows, cols):
+    """
+    Returns (offsets, indices) arrays for the sparse rows described by
+    parallel `rows` and `cols` arrays. Each row is sorted and deduplicated.
+    """
+    counts = array("i", bytes(4 * (num_rows + 1)))
+    for r in rows:
+        counts[r + 1] += 1
+    for i in range(num_rows):
+        counts[i + 1] += counts[i]
+
+    # Counting sort of cols into their rows
+    fill = array("i", counts)
+    scattered = array("i", bytes(4 * len(rows)))
+    for r, c in zip(rows, cols):
+        scattered[fill[r]] = c
+        fill[r] += 1
+
+    offsets = array("i", [0])
+    indices = array("i")
+    for i in range(num_rows):
+        indices.extend(sorted(set(scattered[counts[i]:counts[i + 1]])))
+        offsets.append(len(indices))
+    return offsets, indices
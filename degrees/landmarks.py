@@ -0,0 +1,229 @@
+import heapq
+import itertools
+import mmap
+import os
+import struct
+from array import array
+from collections import deque
+
+from snapshot import SOURCES, source_signature
+
+LANDMARKS_FILE = "degrees.landmarks"
+MAGIC = b"DEGLAND2"
+UNREACHABLE = -1
+
+# Magic, number of landmarks, number of people, number of person -> movie
+# entries, then (size, mtime_ns) of each source CSV
+HEADER = struct.Struct("<8sqqq" + "q" * (2 * len(SOURCES)))
+
+
+class Landmarks():
+    """
+    Breadth-first distances from a few landmark people to everyone,
+    used as triangle-inequality bounds on degrees of separation.
+    """
+
+    def __init__(self, landmarks, distances):
+        # Landmark states, and one distance table per landmark indexed by
+        # state, holding UNREACHABLE for people in other components
+        self.landmarks = landmarks
+        self.distances = distances
+
+    @classmethod
+    def build(cls, states, neighbors, degree, k=8, table=None):
+        """
+        Choose the `k` states with the highest `degree` as landmarks
+        and run a breadth-first search from each of them.
+
+        `table` creates an empty distance table; by default a dict over
+        `states`, while integer states can use an array.
+        """
+        states = list(states)
+        table = table or (lambda: dict.fromkeys(states, UNREACHABLE))
+        landmarks = heapq.nlargest(k, states, key=degree)
+        distances = []
+        for landmark in landmarks:
+            distances.append(bfs_distances(landmark, neighbors, table()))
+        return cls(landmarks, distances)
+
+    def affected_by(self, a, b):
+        """
+        Returns True if a new link between states `a` and `b` changes
+        the distance from any landmark.
+        """
+        for distances in self.distances:
+            d_a = distances[a]
+            d_b = distances[b]
+            if (d_a == UNREACHABLE) != (d_b == UNREACHABLE):
+                return True
+            if abs(d_a - d_b) > 1:
+                return True
+        return False
+
+    def lower_bound(self, target):
+        """
+        Returns a function giving a lower bound on the distance from a
+        state to `target`, or None if the state cannot reach it.
+        """
+        to_target = [distances[target] for distances in self.distances]
+        tables = list(zip(self.distances, to_target))
+
+        def bound(state):
+            best = 0
+            for distances, d_target in tables:
+                d_state = distances[state]
+                if (d_state == UNREACHABLE) != (d_target == UNREACHABLE):
+                    return None
+                if d_state != UNREACHABLE:
+                    best = max(best, abs(d_target - d_state))
+            return best
+
+        return bound
+
+    def upper_bound(self, source, target):
+        """
+        Returns an upper bound on the distance from `source` to
+        `target` via the nearest shared landmark, or None if unknown.
+        """
+        best = None
+        for distances in self.distances:
+            d_source = distances[source]
+            d_target = distances[target]
+            if d_source == UNREACHABLE or d_target == UNREACHABLE:
+                continue
+            if best is None or d_source + d_target < best:
+                best = d_source + d_target
+        return best
+
+
+def bfs_distances(source, neighbors, distances):
+    """
+    Fill `distances` with the breadth-first distance of every state
+    reachable from `source` and return it.
+    """
+    distances[source] = 0
+    queue = deque([source])
+    while queue:
+        state = queue.popleft()
+        depth = distances[state] + 1
+        for _, neighbor in neighbors(state):
+            if distances[neighbor] == UNREACHABLE:
+                distances[neighbor] = depth
+                queue.append(neighbor)
+    return distances
+
+
+def alt_search(source, target, neighbors, landmarks, stats=None):
+    """
+    Returns the shortest list of (action, state) pairs from source to
+    target, or None if unreachable, using A* search guided by the
+    landmark lower bounds.
+    """
+    bound = landmarks.lower_bound(target)
+    estimate = bound(source)
+    if estimate is None:
+        return None
+
+    # Heap of (cost + estimate, -cost, tie breaker, state), preferring
+    # deeper states among equal estimates
+    counter = itertools.count()
+    heap = [(estimate, 0, next(counter), source)]
+    costs = {source: 0}
+    parents = {source: (None, None)}
+    while heap:
+        _, cost, _, state = heapq.heappop(heap)
+        cost = -cost
+        if cost > costs[state]:
+            continue
+        if stats is not None:
+            stats.observe_frontier(len(heap) + 1)
+            stats.nodes_expanded += 1
+
+        if state == target:
+            path = []
+            while state != source:
+                action, parent = parents[state]
+                path.append((action, state))
+                state = parent
+            path.reverse()
+            return path
+
+        for action, neighbor in neighbors(state):
+            if stats is not None:
+                stats.neighbors_generated += 1
+            if cost + 1 >= costs.get(neighbor, cost + 2):
+                continue
+            estimate = bound(neighbor)
+            if estimate is None:
+                continue
+            costs[neighbor] = cost + 1
+            parents[neighbor] = (action, state)
+            heapq.heappush(
+                heap, (cost + 1 + estimate, -(cost + 1), next(counter), neighbor))
+    return None
+
+
+def build_graph_landmarks(graph, k=8):
+    """
+    Build Landmarks over the interned people of a CompactGraph,
+    storing distances as int16 arrays.
+    """
+    n = graph.num_people
+    return Landmarks.build(
+        range(n), graph.neighbors,
+        degree=lambda p: len(graph.movies_of(p)), k=k,
+        table=lambda: array("h", [UNREACHABLE]) * n
+    )
+
+
+def write_landmarks(landmarks, graph, directory):
+    """
+    Write CompactGraph landmarks to `directory`/degrees.landmarks,
+    tagged with the signature of the CSVs in `directory`.
+    """
+    path = os.path.join(directory, LANDMARKS_FILE)
+    signature = source_signature(directory) or [0] * (2 * len(SOURCES))
+    with open(path, "wb") as f:
+        f.write(HEADER.pack(
+            MAGIC, len(landmarks.landmarks), graph.num_people, graph.num_stars,
+            *signature))
+        f.write(array("i", landmarks.landmarks))
+        f.write(b"\0" * (-f.tell() % 8))
+        for distances in landmarks.distances:
+            f.write(distances)
+    return path
+
+
+def load_landmarks(graph, directory, k):
+    """
+    Memory-map `k` landmarks for a CompactGraph from `directory`, or
+    return None if the file is missing, was built for another graph, or
+    is older than the CSVs in `directory`.
+    """
+    path = os.path.join(directory, LANDMARKS_FILE)
+    try:
+        f = open(path, "rb")
+    except OSError:
+        return None
+    with f:
+        if os.fstat(f.fileno()).st_size < HEADER.size:
+            return None
+        mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    magic, count, num_people, num_entries, *signature = HEADER.unpack_from(mapping)
+    if (magic != MAGIC or count != k or num_people != graph.num_people
+            or num_entries != graph.num_stars):
+        return None
+    current = source_signature(directory)
+    if current is not None and current != signature:
+        return None
+
+    view = memoryview(mapping)
+    position = HEADER.size + 4 * k
+    landmarks = list(view[HEADER.size:position].cast("i"))
+    position += -position % 8
+    distances = []
+    for _ in range(k):
+        distances.append(view[position:position + 2 * num_people].cast("h"))
+        position += 2 * num_people
+    return Landmarks(landmarks, distances)
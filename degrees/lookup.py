@@ -0,0 +1,182 @@
+from bisect import bisect_left, insort
+from collections import Counter, namedtuple
+
+# A possible match for a looked-up name, where distance is the edit
+# distance from the query and popularity the number of movies
+Candidate = namedtuple("Candidate", "person_id name birth distance popularity")
+
+# Non-interactive disambiguation policies for NameIndex.resolve:
+# "best" takes the top-ranked candidate, falling back to fuzzy matches;
+# "unique" only accepts a name with exactly one exact match
+POLICIES = ("best", "unique")
+
+
+class NameIndex():
+    """
+    Exact, prefix and fuzzy lookup of people by name.
+    """
+
+    def __init__(self, records, popularity=None):
+        """
+        Build the index from (person_id, name, birth) records;
+        `popularity` maps a person_id to a ranking weight.
+        """
+        self.records = {}
+        self.exact_names = {}
+        for person_id, name, birth in records:
+            self.records[person_id] = (name, birth)
+            self.exact_names.setdefault(name.lower(), []).append(person_id)
+        self.sorted_names = sorted(self.exact_names)
+        self.popularity = popularity or (lambda person_id: 0)
+        self.trigrams = None
+
+    def add(self, person_id, name, birth):
+        """
+        Add a person to the index.
+        """
+        key = name.lower()
+        self.records[person_id] = (name, birth)
+        if key not in self.exact_names:
+            self.exact_names[key] = []
+            insort(self.sorted_names, key)
+            if self.trigrams is not None:
+                self._index_trigrams(key)
+        self.exact_names[key].append(person_id)
+
+    def _index_trigrams(self, key):
+        for trigram in _trigrams(key):
+            self.trigrams.setdefault(trigram, {}).setdefault(len(key), []).append(key)
+
+    def _candidates(self, keys):
+        """
+        Returns ranked Candidates for (lowercase name, distance) keys.
+        """
+        candidates = []
+        for key, distance in keys:
+            for person_id in self.exact_names[key]:
+                name, birth = self.records[person_id]
+                candidates.append(Candidate(
+                    person_id, name, birth, distance, self.popularity(person_id)))
+        candidates.sort(key=lambda c: (c.distance, -c.popularity, c.name, c.birth))
+        return candidates
+
+    def exact(self, name):
+        """
+        Returns ranked Candidates whose name matches `name` ignoring case.
+        """
+        key = name.lower()
+        if key not in self.exact_names:
+            return []
+        return self._candidates([(key, 0)])
+
+    def prefix(self, prefix, limit=10):
+        """
+        Returns up to `limit` ranked Candidates whose name starts with `prefix`.
+        """
+        prefix = prefix.lower()
+        keys = []
+        position = bisect_left(self.sorted_names, prefix)
+        while position < len(self.sorted_names):
+            key = self.sorted_names[position]
+            if not key.startswith(prefix):
+                break
+            keys.append((key, 0))
+            position += 1
+        return self._candidates(keys)[:limit]
+
+    def fuzzy(self, name, max_distance=2, limit=10, shortlist=200):
+        """
+        Returns up to `limit` ranked Candidates within `max_distance` edits
+        of `name`. Only the `shortlist` names sharing the most trigrams
+        with `name` are compared.
+
+        Trigrams are indexed by name length, so only names of a length
+        within `max_distance` are considered. As one edit changes at most
+        three trigrams, a match shares all but 3 * `max_distance` of the
+        query's trigrams; the most common trigrams are left uncounted as
+        long as a match must still share one of the rest.
+        """
+        if self.trigrams is None:
+            self.trigrams = {}
+            for key in self.sorted_names:
+                self._index_trigrams(key)
+
+        query = name.lower()
+        query_trigrams = _trigrams(query)
+        lengths = range(len(query) - max_distance, len(query) + max_distance + 1)
+        postings = []
+        for trigram in query_trigrams:
+            by_length = self.trigrams.get(trigram, {})
+            postings.append([by_length[n] for n in lengths if n in by_length])
+
+        # Names sharing fewer than `needed` trigrams cannot match
+        needed = len(query_trigrams) - 3 * max_distance
+        if needed > 1:
+            postings.sort(key=lambda lists: sum(map(len, lists)))
+            postings = postings[:len(postings) - needed + 1]
+
+        shared = Counter()
+        for lists in postings:
+            for keys in lists:
+                shared.update(keys)
+
+        keys = []
+        for key, _ in shared.most_common(shortlist):
+            if len(query_trigrams & _trigrams(key)) < needed:
+                continue
+            distance = edit_distance(query, key, max_distance)
+            if distance is not None:
+                keys.append((key, distance))
+        return self._candidates(keys)[:limit]
+
+    def search(self, name, limit=10, max_distance=2):
+        """
+        Returns exact matches for `name` if there are any,
+        otherwise fuzzy matches.
+        """
+        return self.exact(name)[:limit] or self.fuzzy(name, max_distance, limit)
+
+    def resolve(self, name, policy="best"):
+        """
+        Returns a single person_id for `name` under a disambiguation
+        policy from POLICIES, or None if it cannot be resolved.
+        """
+        if policy not in POLICIES:
+            raise ValueError(f"unknown policy: {policy}")
+        if policy == "unique":
+            candidates = self.exact(name)
+            return candidates[0].person_id if len(candidates) == 1 else None
+        candidates = self.search(name, limit=1)
+        return candidates[0].person_id if candidates else None
+
+
+def _trigrams(text):
+    padded = f"  {text} "
+    return set(padded[i:i + 3] for i in range(len(padded) - 2))
+
+
+def edit_distance(a, b, max_distance):
+    """
+    Returns the Levenshtein distance between `a` and `b`, or None if it
+    exceeds `max_distance`. Only cells within `max_distance` of the
+    diagonal are computed.
+    """
+    if abs(len(a) - len(b)) > max_distance:
+        return None
+    beyond = max_distance + 1
+    previous = [min(j, beyond) for j in range(len(b) + 1)]
+    for i, char in enumerate(a, 1):
+        lo = max(1, i - max_distance)
+        hi = min(len(b), i + max_distance)
+        current = [beyond] * (len(b) + 1)
+        current[0] = min(i, beyond)
+        for j in range(lo, hi + 1):
+            current[j] = min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (char != b[j - 1])
+            )
+        if min(current[lo - 1:hi + 1]) > max_distance:
+            return None
+        previous = current
+    return previous[-1] if previous[-1] <= max_distance else None
@@ -0,0 +1,48 @@
+import multiprocessing
+
+from batch import group_by_source
+
+# Query function inherited by forked workers; set by run_parallel
+_answer = None
+
+
+def run_parallel(pairs, answer, workers=None, chunk_size=256):
+    """
+    Yields (index, source, target, path) for each (source, target) pair
+    in input order, spreading the queries across `workers` processes.
+
+    `answer` takes a list of pairs and yields (index, source, target,
+    path) results in any order, e.g. degrees.shortest_paths. Workers are
+    forked after the graph has been loaded, so they share the parent's
+    read-only copy (or snapshot mapping) instead of reloading it.
+    """
+    global _answer
+    _answer = answer
+
+    # Keep queries with the same source in the same chunk where possible
+    queries = group_by_source(pairs)
+    chunks = [
+        queries[i:i + chunk_size] for i in range(0, len(queries), chunk_size)
+    ]
+
+    context = multiprocessing.get_context("fork")
+    with context.Pool(workers) as pool:
+        pending = {}
+        next_index = 0
+        for results in pool.imap_unordered(_answer_chunk, chunks):
+            for result in results:
+                pending[result[0]] = result
+            while next_index in pending:
+                yield pending.pop(next_index)
+                next_index += 1
+
+
+def _answer_chunk(chunk):
+    """
+    Answer one chunk of (index, source, target) queries in a worker.
+    """
+    pairs = [(source, target) for _, source, target in chunk]
+    return [
+        (chunk[i][0], source, target, path)
+        for i, source, target, path in _answer(pairs)
+    ]
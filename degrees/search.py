@@ -0,0 +1,329 @@
+import heapq
+import itertools
+from collections import deque
+
+from util import Node, DequeQueueFrontier
+
+
+class SearchStats():
+    """
+    Counters filled in by a search when passed as `stats`.
+    """
+
+    def __init__(self):
+        self.strategy = None
+        self.nodes_expanded = 0
+        self.neighbors_generated = 0
+        self.frontier_peak = 0
+        self.path_length = None
+        self.elapsed = 0.0
+
+    def observe_frontier(self, size):
+        if size > self.frontier_peak:
+            self.frontier_peak = size
+
+    def report(self):
+        """
+        Returns the counters as a human-readable multi-line string.
+        """
+        return "\n".join([
+            f"Strategy: {self.strategy}",
+            f"Nodes expanded: {self.nodes_expanded}",
+            f"Neighbors generated: {self.neighbors_generated}",
+            f"Frontier peak: {self.frontier_peak}",
+            f"Path length: {self.path_length}",
+            f"Time: {1000 * self.elapsed:.3f} ms",
+        ])
+
+
+def breadth_first_search(source, target, neighbors,
+                         frontier_class=DequeQueueFrontier, stats=None):
+    """
+    Returns the shortest list of (action, state) pairs from source to
+    target, expanding states with `neighbors`, or None if unreachable.
+
+    Any frontier from util can be passed as `frontier_class`; the list
+    based StackFrontier and QueueFrontier are kept for comparison.
+    """
+    explored = set()
+    start = Node(source, parent=None, action=None)
+    frontier = frontier_class()
+    frontier.add(start)
+    # Keep looping until solution found
+    while True:
+
+        # If nothing left in frontier, then no path
+        if frontier.empty():
+            return None
+
+        # Choose a node from the frontier
+        if stats is not None:
+            stats.observe_frontier(len(frontier.frontier))
+            stats.nodes_expanded += 1
+        node = frontier.remove()
+
+        # If node is the goal, then we have a solution
+        if node.state == target:
+            path = []
+            while node.parent is not None:
+                path.append((node.action, node.state))
+                node = node.parent
+            path.reverse()
+            return path
+
+        # Mark node as explored
+        explored.add(node.state)
+
+        # Add neighbors to frontier
+        for movie_id, person_id in neighbors(node.state):
+            if stats is not None:
+                stats.neighbors_generated += 1
+            if not frontier.contains_state(person_id) and person_id not in explored:
+                child = Node(state=person_id, parent=node, action=movie_id)
+                if person_id == target:
+                    frontier.seed(child)
+                else:
+                    frontier.add(child)
+
+
+def bidirectional_search(source, target, neighbors, stats=None):
+    """
+    Returns the shortest list of (action, state) pairs from source to
+    target, or None if unreachable.
+
+    Frontiers grow one full level at a time from both ends, always
+    expanding the smaller side. `neighbors` must be symmetric.
+    """
+    if source == target:
+        return []
+
+    # Maps each reached state to (action, previous state, depth)
+    forward = {source: (None, None, 0)}
+    backward = {target: (None, None, 0)}
+    forward_frontier = [source]
+    backward_frontier = [target]
+
+    while forward_frontier and backward_frontier:
+        if len(forward_frontier) <= len(backward_frontier):
+            frontier, reached, other = forward_frontier, forward, backward
+        else:
+            frontier, reached, other = backward_frontier, backward, forward
+
+        # Expand a whole level, keeping the best meeting point seen
+        if stats is not None:
+            stats.observe_frontier(len(forward_frontier) + len(backward_frontier))
+            stats.nodes_expanded += len(frontier)
+        best = None
+        next_frontier = []
+        for state in frontier:
+            depth = reached[state][2] + 1
+            for action, neighbor in neighbors(state):
+                if stats is not None:
+                    stats.neighbors_generated += 1
+                if neighbor in reached:
+                    continue
+                reached[neighbor] = (action, state, depth)
+                next_frontier.append(neighbor)
+                if neighbor in other:
+                    length = depth + other[neighbor][2]
+                    if best is None or length < best[0]:
+                        best = (length, neighbor)
+
+        if best is not None:
+            return _join_paths(forward, backward, best[1])
+
+        if reached is forward:
+            forward_frontier = next_frontier
+        else:
+            backward_frontier = next_frontier
+
+    return None
+
+
+def _join_paths(forward, backward, meeting):
+    """
+    Stitches the forward and backward parent maps together at `meeting`.
+    """
+    path = []
+    state = meeting
+    while forward[state][1] is not None:
+        action, previous, _ = forward[state]
+        path.append((action, state))
+        state = previous
+    path.reverse()
+
+    # Backward parents point towards the target
+    state = meeting
+    while backward[state][1] is not None:
+        action, following, _ = backward[state]
+        path.append((action, following))
+        state = following
+    return path
+
+
+def hyperedge_search(source, target, movies_of, stars_of, stats=None):
+    """
+    Returns the shortest list of (movie, person) pairs from source to
+    target, or None if unreachable.
+
+    Movies are treated as hyperedges: each movie's cast is scanned once,
+    by the first person expanded who starred in it, and co-stars are
+    visited straight from `stars_of` without building neighbor pairs.
+    """
+    if source == target:
+        return []
+
+    # Maps each reached person to (movie, previous person)
+    parents = {source: (None, None)}
+    expanded = set()
+    queue = deque([source])
+    while queue:
+        if stats is not None:
+            stats.observe_frontier(len(queue))
+            stats.nodes_expanded += 1
+        person = queue.popleft()
+        for movie in movies_of(person):
+            if movie in expanded:
+                continue
+            expanded.add(movie)
+            for star in stars_of(movie):
+                if stats is not None:
+                    stats.neighbors_generated += 1
+                if star in parents:
+                    continue
+                parents[star] = (movie, person)
+                if star == target:
+                    return _trace_path(parents, target)
+                queue.append(star)
+    return None
+
+
+def _trace_path(parents, state):
+    """
+    Follows (action, parent) links back from `state` to the root.
+    """
+    path = []
+    action, parent = parents[state]
+    while parent is not None:
+        path.append((action, state))
+        state = parent
+        action, parent = parents[state]
+    path.reverse()
+    return path
+
+
+def shortest_path_dag(source, target, neighbors):
+    """
+    Returns a dict mapping each state on any shortest path from source
+    to target to its list of (action, parent) links towards the source,
+    or None if target is unreachable.
+
+    The search is level-synchronous and stops after the target's level;
+    links off the shortest paths are then dropped.
+    """
+    parents = {source: []}
+    frontier = [source]
+    while frontier and target not in parents:
+        level = {}
+        for state in frontier:
+            for action, neighbor in neighbors(state):
+                if neighbor in parents:
+                    continue
+                level.setdefault(neighbor, []).append((action, state))
+        parents.update(level)
+        frontier = list(level)
+
+    if target not in parents:
+        return None
+
+    # Keep only states from which the target was reached
+    dag = {}
+    pending = [target]
+    while pending:
+        state = pending.pop()
+        if state in dag:
+            continue
+        dag[state] = parents[state]
+        pending.extend(parent for _, parent in parents[state])
+    return dag
+
+
+def all_shortest_paths(source, target, neighbors, limit=None):
+    """
+    Yields every shortest list of (action, state) pairs from source to
+    target, up to `limit` of them, enumerating the DAG lazily.
+    """
+    if limit is not None and limit < 1:
+        return
+    dag = shortest_path_dag(source, target, neighbors)
+    if dag is None:
+        return
+
+    # Depth-first over parent links, from the target back to the source
+    count = 0
+    stack = [(target, [])]
+    while stack:
+        state, suffix = stack.pop()
+        if state == source:
+            yield suffix
+            count += 1
+            if limit is not None and count >= limit:
+                return
+            continue
+        for action, parent in reversed(dag[state]):
+            stack.append((parent, [(action, state)] + suffix))
+
+
+def k_shortest_paths(source, target, neighbors, k):
+    """
+    Yields up to `k` loopless lists of (action, state) pairs from source
+    to target in order of increasing length, using Yen's algorithm with
+    breadth-first spur searches.
+    """
+    if k < 1:
+        return
+    path = breadth_first_search(source, target, neighbors)
+    if path is None:
+        return
+
+    found = [path]
+    candidates = []
+    seen = {tuple(path)}
+    counter = itertools.count()
+    yield path
+
+    while len(found) < k:
+        previous = found[-1]
+        states = [source] + [state for _, state in previous]
+        for i in range(len(previous)):
+            root = previous[:i]
+            spur = states[i]
+
+            # Links already used from this root, and states on the root
+            banned_links = set()
+            for other in found:
+                if other[:i] == root:
+                    banned_links.add(other[i])
+            banned_states = set(states[:i])
+
+            def spur_neighbors(state):
+                for action, neighbor in neighbors(state):
+                    if neighbor in banned_states:
+                        continue
+                    if state == spur and (action, neighbor) in banned_links:
+                        continue
+                    yield action, neighbor
+
+            spur_path = breadth_first_search(spur, target, spur_neighbors)
+            if spur_path is None:
+                continue
+            candidate = root + spur_path
+            if tuple(candidate) not in seen:
+                seen.add(tuple(candidate))
+                heapq.heappush(candidates, (len(candidate), next(counter), candidate))
+
+        if not candidates:
+            return
+        _, _, path = heapq.heappop(candidates)
+        found.append(path)
+        yield path
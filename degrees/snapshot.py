@@ -0,0 +1,248 @@
+import mmap
+import os
+import struct
+from array import array
+
+from graph import CompactGraph
+
+SNAPSHOT_FILE = "degrees.snap"
+MAGIC = b"DEGSNAP1"
+SOURCES = ["people.csv", "movies.csv", "stars.csv"]
+
+# Sections in file order, each with its array typecode
+SECTIONS = [
+    ("person_offsets", "i"),
+    ("person_movies", "i"),
+    ("movie_offsets", "i"),
+    ("movie_stars", "i"),
+    ("person_id_offsets", "q"), ("person_id_blob", "B"),
+    ("person_name_offsets", "q"), ("person_name_blob", "B"),
+    ("person_birth_offsets", "q"), ("person_birth_blob", "B"),
+    ("movie_id_offsets", "q"), ("movie_id_blob", "B"),
+    ("movie_title_offsets", "q"), ("movie_title_blob", "B"),
+    ("movie_year_offsets", "q"), ("movie_year_blob", "B"),
+    ("person_id_order", "i"),
+    ("movie_id_order", "i"),
+    ("name_order", "i"),
+]
+
+# Magic, then (size, mtime_ns) of each source, then (offset, length) per section
+HEADER = struct.Struct("<8s" + "q" * (2 * len(SOURCES)) + "q" * (2 * len(SECTIONS)))
+
+
+class StringTable():
+    """
+    Read-only sequence of strings stored as an offsets array and a
+    UTF-8 blob; strings are decoded on access.
+    """
+
+    def __init__(self, offsets, blob):
+        self.offsets = offsets
+        self.blob = blob
+        # Strings appended after loading
+        self.added = []
+
+    def __len__(self):
+        return len(self.offsets) - 1 + len(self.added)
+
+    def __getitem__(self, i):
+        size = len(self.offsets) - 1
+        if i >= size:
+            return self.added[i - size]
+        return str(self.blob[self.offsets[i]:self.offsets[i + 1]], "utf-8")
+
+    def append(self, value):
+        self.added.append(value)
+
+
+class TableIndex():
+    """
+    Read-only mapping from key(table[i]) to i, backed by an array of
+    indices sorted by key. With `multi`, lookups return a list of all
+    matching indices.
+    """
+
+    def __init__(self, table, order, key=None, multi=False):
+        self.table = table
+        self.order = order
+        self.key = key or (lambda value: value)
+        self.multi = multi
+        # Entries set after loading, overriding the sorted order
+        self.added = {}
+
+    def _key_at(self, position):
+        return self.key(self.table[self.order[position]])
+
+    def _lower_bound(self, key):
+        lo, hi = 0, len(self.order)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._key_at(mid) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def get(self, key, default=None):
+        if key in self.added:
+            return self.added[key]
+        position = self._lower_bound(key)
+        matches = []
+        while position < len(self.order) and self._key_at(position) == key:
+            matches.append(self.order[position])
+            if not self.multi:
+                return matches[0]
+            position += 1
+        return matches if matches else default
+
+    def __getitem__(self, key):
+        value = self.get(key)
+        if value is None:
+            raise KeyError(key)
+        return value
+
+    def __contains__(self, key):
+        return self.get(key) is not None
+
+    def __setitem__(self, key, value):
+        self.added[key] = value
+
+    def setdefault(self, key, default=None):
+        value = self.get(key)
+        if value is None:
+            value = default
+        self.added[key] = value
+        return value
+
+
+def source_signature(directory):
+    """
+    Returns (size, mtime_ns) for each source CSV, or None if one is missing.
+    """
+    signature = []
+    for filename in SOURCES:
+        try:
+            stat = os.stat(os.path.join(directory, filename))
+        except OSError:
+            return None
+        signature.extend([stat.st_size, stat.st_mtime_ns])
+    return signature
+
+
+def write_snapshot(graph, directory, path=None):
+    """
+    Write `graph` to a binary snapshot, by default `directory`/degrees.snap,
+    tagged with the signature of the CSVs in `directory`.
+    """
+    path = path or os.path.join(directory, SNAPSHOT_FILE)
+    signature = source_signature(directory) or [0] * (2 * len(SOURCES))
+
+    if graph.num_added or len(graph.person_offsets) <= graph.num_people:
+        graph.compact()
+
+    sections = {
+        "person_offsets": array("i", graph.person_offsets),
+        "person_movies": array("i", graph.person_movies),
+        "movie_offsets": array("i", graph.movie_offsets),
+        "movie_stars": array("i", graph.movie_stars),
+    }
+    tables = [
+        ("person_id", graph.person_ids),
+        ("person_name", graph.person_names),
+        ("person_birth", graph.person_births),
+        ("movie_id", graph.movie_ids),
+        ("movie_title", graph.movie_titles),
+        ("movie_year", graph.movie_years),
+    ]
+    for name, values in tables:
+        offsets = array("q", [0])
+        blob = bytearray()
+        for i in range(len(values)):
+            blob += values[i].encode("utf-8")
+            offsets.append(len(blob))
+        sections[f"{name}_offsets"] = offsets
+        sections[f"{name}_blob"] = blob
+
+    people = range(graph.num_people)
+    movies = range(graph.num_movies)
+    sections["person_id_order"] = array(
+        "i", sorted(people, key=graph.person_ids.__getitem__))
+    sections["movie_id_order"] = array(
+        "i", sorted(movies, key=graph.movie_ids.__getitem__))
+    sections["name_order"] = array(
+        "i", sorted(people, key=lambda p: graph.person_names[p].lower()))
+
+    # Lay sections out after the header, aligned to 8 bytes
+    layout = []
+    position = HEADER.size
+    for name, _ in SECTIONS:
+        position += -position % 8
+        length = len(memoryview(sections[name]).cast("B"))
+        layout.extend([position, length])
+        position += length
+
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(HEADER.pack(MAGIC, *signature, *layout))
+        for (name, _), offset in zip(SECTIONS, layout[::2]):
+            f.write(b"\0" * (offset - f.tell()))
+            f.write(memoryview(sections[name]).cast("B"))
+    os.replace(tmp, path)
+    return path
+
+
+def load_snapshot(directory, path=None):
+    """
+    Memory-map a snapshot into a CompactGraph. Returns None if the
+    snapshot is missing, malformed, or older than the CSVs in `directory`.
+    """
+    path = path or os.path.join(directory, SNAPSHOT_FILE)
+    try:
+        f = open(path, "rb")
+    except OSError:
+        return None
+    with f:
+        if os.fstat(f.fileno()).st_size < HEADER.size:
+            return None
+        mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    fields = HEADER.unpack_from(mapping)
+    signature = list(fields[1:1 + 2 * len(SOURCES)])
+    layout = fields[1 + 2 * len(SOURCES):]
+    if fields[0] != MAGIC:
+        return None
+    current = source_signature(directory)
+    if current is not None and current != signature:
+        return None
+
+    view = memoryview(mapping)
+    sections = {}
+    for (name, typecode), offset, length in zip(SECTIONS, layout[::2], layout[1::2]):
+        # A truncated or corrupt file may point sections past its end
+        if offset < 0 or length < 0 or offset + length > len(mapping):
+            return None
+        if length % array(typecode).itemsize:
+            return None
+        sections[name] = view[offset:offset + length].cast(typecode)
+
+    graph = CompactGraph()
+    graph.person_offsets = sections["person_offsets"]
+    graph.person_movies = sections["person_movies"]
+    graph.movie_offsets = sections["movie_offsets"]
+    graph.movie_stars = sections["movie_stars"]
+
+    def table(name):
+        return StringTable(sections[f"{name}_offsets"], sections[f"{name}_blob"])
+
+    graph.person_ids = table("person_id")
+    graph.person_names = table("person_name")
+    graph.person_births = table("person_birth")
+    graph.movie_ids = table("movie_id")
+    graph.movie_titles = table("movie_title")
+    graph.movie_years = table("movie_year")
+
+    graph.person_index = TableIndex(graph.person_ids, sections["person_id_order"])
+    graph.movie_index = TableIndex(graph.movie_ids, sections["movie_id_order"])
+    graph.names = TableIndex(
+        graph.person_names, sections["name_order"], key=str.lower, multi=True)
+    return graph
@@ -0,0 +1,117 @@
+import os
+import re
+from array import array
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from linkcache import load_cache, write_cache
+from linkgraph import LinkGraph
+
+LINK_PATTERN = re.compile(r"<a\s+(?:[^>]*?)href=\"([^\"]*)\"")
+
+# Characters read from a page at a time
+CHUNK_SIZE = 1 << 16
+
+# Pages read ahead of the consumer, per worker thread
+READ_AHEAD = 4
+
+
+def scan_links(path, chunk_size=CHUNK_SIZE):
+    """
+    Returns the set of link targets in the HTML file at `path`, reading
+    it in chunks so that only a chunk of the page is held at a time.
+    """
+    links = set()
+    carry = ""
+    with open(path) as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            buffer = carry + chunk
+            end = 0
+            for match in LINK_PATTERN.finditer(buffer):
+                links.add(match.group(1))
+                end = match.end()
+
+            # Keep an unfinished tag for the next chunk
+            start = buffer.rfind("<", end)
+            carry = buffer[start:] if start != -1 else ""
+    return links
+
+
+def html_files(directory):
+    """
+    Returns a dict mapping the name of each .html file in `directory`
+    to its (size, mtime_ns).
+    """
+    files = {}
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            if entry.name.endswith(".html") and entry.is_file():
+                stat = entry.stat()
+                files[entry.name] = (stat.st_size, stat.st_mtime_ns)
+    return files
+
+
+def crawl_links(directory, workers=None, cache=True):
+    """
+    Yields (page, links) for each page in `directory`, where links is the
+    set of other pages in the corpus it links to. Pages are read and
+    scanned by a pool of `workers` threads, at most READ_AHEAD pages per
+    worker ahead of the consumer.
+
+    With `cache`, links are kept in `directory`/pagerank.cache and only
+    pages whose size or mtime changed since the last crawl are re-read;
+    every page's links are then held in memory until the cache is written.
+    """
+    files = html_files(directory)
+    corpus = set(files)
+    cached = load_cache(directory) if cache else {}
+    entries = {}
+    stale = []
+    for page, signature in files.items():
+        entry = cached.get(page)
+        if entry is not None and entry[:2] == signature:
+            entries[page] = entry
+            yield page, entry[2] & corpus
+        else:
+            stale.append(page)
+
+    def read(page):
+        links = scan_links(os.path.join(directory, page))
+        links.discard(page)
+        if cache:
+            entries[page] = (*files[page], links)
+        return page, links & corpus
+
+    workers = workers or min(32, (os.cpu_count() or 1) + 4)
+    with ThreadPoolExecutor(workers) as executor:
+        pending = deque()
+        for page in stale:
+            if len(pending) >= READ_AHEAD * workers:
+                yield pending.popleft().result()
+            pending.append(executor.submit(read, page))
+        while pending:
+            yield pending.popleft().result()
+
+    if cache and (stale or len(cached) != len(entries)):
+        try:
+            write_cache(entries, directory)
+        except OSError:
+            pass
+
+
+def crawl_graph(directory, workers=None, cache=True):
+    """
+    Returns a LinkGraph for the pages in `directory`, built from
+    crawl_links without an intermediate dict of link sets.
+    """
+    index = {}
+    sources = array("q")
+    targets = array("q")
+    for page, links in crawl_links(directory, workers, cache):
+        source = index.setdefault(page, len(index))
+        sources.extend([source] * len(links))
+        targets.extend(index.setdefault(link, len(index)) for link in links)
+    return LinkGraph(list(index), sources, targets)
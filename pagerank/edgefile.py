@@ -0,0 +1,192 @@
+import os
+import struct
+import tempfile
+
+import numpy as np
+
+from crawler import crawl_links, html_files
+from linkgraph import spread_dangling
+
+EDGE_FILE = "pagerank.edges"
+MAGIC = b"PREDGES1"
+
+# Sections in file order, each with its dtype
+SECTIONS = [
+    ("out_degree", np.int64),
+    ("sources", np.int32),
+    ("targets", np.int32),
+    ("name_offsets", np.int64),
+    ("name_blob", np.uint8),
+]
+
+# Magic, pages, links, then (offset, length in items) per section
+HEADER = struct.Struct("<8sqq" + "q" * (2 * len(SECTIONS)))
+
+# Pages per bucket of targets sorted in memory when writing an edge file
+BUCKET_PAGES = 1 << 16
+
+# Links buffered in memory before they are spilled to bucket files
+SPILL_LINKS = 1 << 22
+
+# Links read at a time when streaming an edge file
+CHUNK_LINKS = 1 << 22
+
+# Solvers from linkgraph.SOLVERS that only need propagate, and so can
+# stream an EdgeFile
+STREAM_SOLVERS = ("jacobi", "aitken", "quadratic")
+
+
+class EdgeFile():
+    """
+    A link graph memory-mapped from an edge file: per-page out-degrees
+    and page names, and source/target page index arrays sorted by target.
+    It can be passed to linkgraph.solve with a method from STREAM_SOLVERS,
+    which then reads its links `chunk_links` at a time per iteration.
+    """
+
+    def __init__(self, path, chunk_links=CHUNK_LINKS):
+        self.chunk_links = chunk_links
+        with open(path, "rb") as f:
+            fields = HEADER.unpack(f.read(HEADER.size))
+        if fields[0] != MAGIC:
+            raise ValueError(f"not an edge file: {path}")
+        self.num_pages, self.num_links = fields[1:3]
+        layout = fields[3:]
+        sections = {}
+        for (name, dtype), offset, length in zip(SECTIONS, layout[::2], layout[1::2]):
+            if length:
+                sections[name] = np.memmap(
+                    path, dtype=dtype, mode="r", offset=offset, shape=(length,))
+            else:
+                sections[name] = np.zeros(0, dtype=dtype)
+        self.out_degree = np.array(sections["out_degree"])
+        self.dangling = self.out_degree == 0
+        self.sources = sections["sources"]
+        self.targets = sections["targets"]
+        self.name_offsets = sections["name_offsets"]
+        self.name_blob = sections["name_blob"]
+
+    def __len__(self):
+        return self.num_pages
+
+    def page(self, i):
+        """
+        Returns the name of page `i`.
+        """
+        start, stop = self.name_offsets[i], self.name_offsets[i + 1]
+        return self.name_blob[start:stop].tobytes().decode("utf-8")
+
+    def propagate(self, rank):
+        """
+        Returns the rank each page receives, as LinkGraph.propagate does,
+        streaming the links in chunks of `chunk_links`.
+        """
+        n = self.num_pages
+        chunk_links = self.chunk_links
+        share = np.divide(rank, self.out_degree, out=np.zeros(n), where=self.out_degree > 0)
+        incoming = np.zeros(n)
+        for start in range(0, self.num_links, chunk_links):
+            targets = self.targets[start:start + chunk_links]
+            sources = self.sources[start:start + chunk_links]
+            first = int(targets[0])
+            counts = np.bincount(targets - first, weights=share[sources])
+            incoming[first:first + len(counts)] += counts
+        return spread_dangling(rank, rank[self.dangling].sum(), self.dangling, 0, n, incoming)
+
+    def to_dict(self, rank):
+        """
+        Returns a rank vector as a dict keyed by page name.
+        """
+        return {self.page(i): float(value) for i, value in enumerate(rank)}
+
+
+def write_edge_file(directory, path=None, workers=None, cache=False,
+                    bucket_pages=BUCKET_PAGES, spill_links=SPILL_LINKS):
+    """
+    Crawl `directory` into an edge file, by default
+    `directory`/pagerank.edges, with its links sorted by target.
+
+    Links are spilled to one temporary file per range of `bucket_pages`
+    targets as they are crawled, opened only while a spill appends to it;
+    each bucket is then sorted in memory on its own, so only one bucket
+    of links is held at a time. The link cache is off by default, as
+    with it crawl_links holds every page's link set in memory.
+    """
+    path = path or os.path.join(directory, EDGE_FILE)
+    pages = list(html_files(directory))
+    index = {page: i for i, page in enumerate(pages)}
+    n = len(pages)
+    num_buckets = max(1, -(-n // bucket_pages))
+    out_degree = np.zeros(n, dtype=np.int64)
+
+    with tempfile.TemporaryDirectory(dir=os.path.dirname(os.path.abspath(path))) as spill:
+        buckets = [os.path.join(spill, f"{b}.bucket") for b in range(num_buckets)]
+        pending = []
+        pending_links = 0
+
+        def flush():
+            links = np.concatenate(pending).reshape(-1, 2)
+            bucket_of = links[:, 1] // bucket_pages
+            order = np.argsort(bucket_of, kind="stable")
+            bounds = np.searchsorted(bucket_of[order], np.arange(num_buckets + 1))
+            # Opened per spill, so bucket count is not bound by the open file limit
+            for b in np.flatnonzero(np.diff(bounds)):
+                with open(buckets[b], "ab") as bucket:
+                    links[order[bounds[b]:bounds[b + 1]]].tofile(bucket)
+            pending.clear()
+
+        for page, links in crawl_links(directory, workers, cache):
+            source = index[page]
+            out_degree[source] = len(links)
+            if links:
+                pair = np.empty((len(links), 2), dtype=np.int32)
+                pair[:, 0] = source
+                pair[:, 1] = [index[link] for link in links]
+                pending.append(pair.ravel())
+                pending_links += len(links)
+            if pending_links >= spill_links:
+                flush()
+                pending_links = 0
+        if pending:
+            flush()
+
+        num_links = int(out_degree.sum())
+        names = [page.encode("utf-8") for page in pages]
+        name_offsets = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum([len(name) for name in names], out=name_offsets[1:])
+        lengths = [n, num_links, num_links, n + 1, int(name_offsets[-1])]
+
+        # Lay sections out after the header, aligned to 8 bytes
+        layout = []
+        position = HEADER.size
+        for (_, dtype), length in zip(SECTIONS, lengths):
+            position += -position % 8
+            layout.extend([position, length])
+            position += length * np.dtype(dtype).itemsize
+
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(HEADER.pack(MAGIC, n, num_links, *layout))
+            f.truncate(position)
+            f.seek(layout[0])
+            out_degree.tofile(f)
+
+            # Append each bucket's links, sorted by target, to both arrays
+            written = 0
+            for bucket in buckets:
+                if not os.path.exists(bucket):
+                    continue
+                links = np.fromfile(bucket, dtype=np.int32).reshape(-1, 2)
+                links = links[np.argsort(links[:, 1], kind="stable")]
+                f.seek(layout[2] + 4 * written)
+                np.ascontiguousarray(links[:, 0]).tofile(f)
+                f.seek(layout[4] + 4 * written)
+                np.ascontiguousarray(links[:, 1]).tofile(f)
+                written += len(links)
+
+            f.seek(layout[6])
+            name_offsets.tofile(f)
+            f.seek(layout[8])
+            f.write(b"".join(names))
+    os.replace(tmp, path)
+    return path
@@ -0,0 +1,177 @@
+import os
+import struct
+from array import array
+
+CACHE_FILE = "pagerank.cache"
+MAGIC = b"PRLINKS1"
+
+RANKS_FILE = "pagerank.ranks"
+RANKS_MAGIC = b"PRRANKS1"
+
+# Magic, pages, length of the page name blob
+RANKS_HEADER = struct.Struct("<8sqq")
+
+# Sections in file order, each with its array typecode
+SECTIONS = [
+    ("sizes", "q"),
+    ("mtimes", "q"),
+    ("link_offsets", "q"),
+    ("links", "i"),
+    ("string_offsets", "q"),
+    ("string_blob", "B"),
+]
+
+# Magic, pages, then (offset, length) per section
+HEADER = struct.Struct("<8sq" + "q" * (2 * len(SECTIONS)))
+
+
+def write_cache(entries, directory, path=None):
+    """
+    Write a link cache for the pages of `directory`, by default to
+    `directory`/pagerank.cache. `entries` maps each page to
+    (size, mtime_ns, links), where links are the page's raw link targets.
+
+    Strings are stored once in a table whose first entries are the pages;
+    each page's links are indices into that table.
+    """
+    path = path or os.path.join(directory, CACHE_FILE)
+    pages = list(entries)
+    strings = {page: i for i, page in enumerate(pages)}
+    sizes = array("q")
+    mtimes = array("q")
+    link_offsets = array("q", [0])
+    links = array("i")
+    for page in pages:
+        size, mtime, page_links = entries[page]
+        sizes.append(size)
+        mtimes.append(mtime)
+        for link in page_links:
+            links.append(strings.setdefault(link, len(strings)))
+        link_offsets.append(len(links))
+
+    string_offsets = array("q", [0])
+    string_blob = bytearray()
+    for string in strings:
+        string_blob += string.encode("utf-8")
+        string_offsets.append(len(string_blob))
+
+    sections = {
+        "sizes": sizes,
+        "mtimes": mtimes,
+        "link_offsets": link_offsets,
+        "links": links,
+        "string_offsets": string_offsets,
+        "string_blob": string_blob,
+    }
+
+    # Lay sections out after the header, aligned to 8 bytes
+    layout = []
+    position = HEADER.size
+    for name, _ in SECTIONS:
+        position += -position % 8
+        length = len(memoryview(sections[name]).cast("B"))
+        layout.extend([position, length])
+        position += length
+
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(HEADER.pack(MAGIC, len(pages), *layout))
+        for (name, _), offset in zip(SECTIONS, layout[::2]):
+            f.write(b"\0" * (offset - f.tell()))
+            f.write(memoryview(sections[name]).cast("B"))
+    os.replace(tmp, path)
+    return path
+
+
+def load_cache(directory, path=None):
+    """
+    Returns the cached entries for `directory` as a dict mapping each
+    page to (size, mtime_ns, links), or an empty dict if the cache is
+    missing or malformed.
+    """
+    path = path or os.path.join(directory, CACHE_FILE)
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+    except OSError:
+        return {}
+    if len(data) < HEADER.size:
+        return {}
+
+    fields = HEADER.unpack_from(data)
+    if fields[0] != MAGIC:
+        return {}
+    num_pages = fields[1]
+    layout = fields[2:]
+    view = memoryview(data)
+    sections = {}
+    for (name, typecode), offset, length in zip(SECTIONS, layout[::2], layout[1::2]):
+        sections[name] = view[offset:offset + length].cast(typecode)
+
+    offsets = sections["string_offsets"]
+    blob = sections["string_blob"]
+    strings = [
+        str(blob[offsets[i]:offsets[i + 1]], "utf-8")
+        for i in range(len(offsets) - 1)
+    ]
+    link_offsets = sections["link_offsets"]
+    links = sections["links"]
+    entries = {}
+    for i in range(num_pages):
+        page_links = set(
+            strings[j] for j in links[link_offsets[i]:link_offsets[i + 1]])
+        entries[strings[i]] = (sections["sizes"][i], sections["mtimes"][i], page_links)
+    return entries
+
+
+def write_ranks(ranks, directory, path=None):
+    """
+    Write a dict of ranks keyed by page to `directory`/pagerank.ranks:
+    a header, the ranks (float64), then page name offsets (int64) and
+    the UTF-8 page names.
+    """
+    path = path or os.path.join(directory, RANKS_FILE)
+    offsets = array("q", [0])
+    blob = bytearray()
+    for page in ranks:
+        blob += page.encode("utf-8")
+        offsets.append(len(blob))
+
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(RANKS_HEADER.pack(RANKS_MAGIC, len(ranks), len(blob)))
+        f.write(array("d", ranks.values()))
+        f.write(offsets)
+        f.write(blob)
+    os.replace(tmp, path)
+    return path
+
+
+def load_ranks(directory, path=None):
+    """
+    Returns the dict of ranks saved for `directory`, or None if there
+    are none.
+    """
+    path = path or os.path.join(directory, RANKS_FILE)
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+    except OSError:
+        return None
+    if len(data) < RANKS_HEADER.size:
+        return None
+
+    magic, count, length = RANKS_HEADER.unpack_from(data)
+    if magic != RANKS_MAGIC:
+        return None
+    view = memoryview(data)
+    position = RANKS_HEADER.size
+    values = view[position:position + 8 * count].cast("d")
+    position += 8 * count
+    offsets = view[position:position + 8 * (count + 1)].cast("q")
+    position += 8 * (count + 1)
+    blob = view[position:position + length]
+    return {
+        str(blob[offsets[i]:offsets[i + 1]], "utf-8"): values[i]
+        for i in range(count)
+    }
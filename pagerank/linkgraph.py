@@ -0,0 +1,304 @@
+from collections import namedtuple
+
+import numpy as np
+
+# Iterative solvers for solve: plain Jacobi power iteration, block
+# Gauss-Seidel sweeps, and Jacobi with periodic Aitken or quadratic
+# extrapolation
+SOLVERS = ("jacobi", "gauss-seidel", "aitken", "quadratic")
+
+NORMS = ("l1", "linf")
+
+# Gauss-Seidel sweeps update at most this many blocks of pages in turn
+GAUSS_SEIDEL_BLOCKS = 64
+
+# Extrapolating solvers extrapolate once every this many iterations
+EXTRAPOLATION_PERIOD = 10
+
+# The result of solve, where residual is the norm of the last change
+Solution = namedtuple("Solution", "rank iterations residual")
+
+
+class LinkGraph():
+    """
+    A corpus interned to integer page indices, with its links stored as
+    parallel source/target arrays sorted by target.
+
+    Dangling pages, which have no links, are treated as linking to every
+    other page; their rank is spread analytically rather than through
+    materialized links.
+    """
+
+    def __init__(self, pages, sources, targets, index=None):
+        self.pages = list(pages)
+        if index is None:
+            index = {page: i for i, page in enumerate(self.pages)}
+        self.index = index
+
+        sources = np.asarray(sources, dtype=np.int64)
+        targets = np.asarray(targets, dtype=np.int64)
+        order = np.argsort(targets, kind="stable")
+        self.sources = sources[order]
+        self.targets = targets[order]
+        self.out_degree = np.bincount(self.sources, minlength=len(self.pages))
+        # Links into pages i..j-1 are at in_offsets[i]:in_offsets[j]
+        self.in_offsets = np.searchsorted(self.targets, np.arange(len(self.pages) + 1))
+
+        self.dangling = self.out_degree == 0
+        self._out_links = None
+
+    @classmethod
+    def from_corpus(cls, corpus):
+        """
+        Build a LinkGraph from a dict mapping each page to the set of
+        pages it links to. `corpus` is left unchanged.
+        """
+        pages = list(corpus)
+        index = {page: i for i, page in enumerate(pages)}
+        sources = []
+        targets = []
+        for i, page in enumerate(pages):
+            links = [index[link] for link in corpus[page] if link in index]
+            sources.extend([i] * len(links))
+            targets.extend(links)
+        return cls(pages, sources, targets)
+
+    def __len__(self):
+        return len(self.pages)
+
+    def apply_delta(self, delta):
+        """
+        Returns a LinkGraph with `delta` applied, where `delta` maps each
+        changed page to its new set of links, or to None if the page was
+        removed. Unchanged pages keep their links without re-interning.
+        """
+        if not delta:
+            return self
+        pages = list(self.pages)
+        index = dict(self.index)
+        removed = []
+        for page, links in delta.items():
+            if links is None:
+                if page in index:
+                    removed.append(index[page])
+            elif page not in index:
+                index[page] = len(pages)
+                pages.append(page)
+        keep = np.ones(len(pages), dtype=bool)
+        keep[removed] = False
+
+        # Drop the old links of changed pages and links to removed pages
+        changed = [index[page] for page in delta if page in index]
+        kept = keep[self.targets] & ~np.isin(self.sources, changed)
+        sources = [self.sources[kept]]
+        targets = [self.targets[kept]]
+        for page, links in delta.items():
+            if links is None:
+                continue
+            new = [index[link] for link in links if link in index and keep[index[link]]]
+            sources.append(np.full(len(new), index[page], dtype=np.int64))
+            targets.append(np.array(new, dtype=np.int64))
+        sources = np.concatenate(sources)
+        targets = np.concatenate(targets)
+
+        if removed:
+            remap = np.cumsum(keep) - 1
+            sources, targets = remap[sources], remap[targets]
+            pages = [page for page, k in zip(pages, keep) if k]
+            index = None
+        return LinkGraph(pages, sources, targets, index)
+
+    def out_links(self):
+        """
+        Returns (offsets, targets) arrays listing each page's outgoing
+        links in CSR form: the links of page i are
+        targets[offsets[i]:offsets[i + 1]].
+        """
+        if self._out_links is None:
+            order = np.argsort(self.sources, kind="stable")
+            offsets = np.zeros(len(self.pages) + 1, dtype=np.int64)
+            np.cumsum(self.out_degree, out=offsets[1:])
+            self._out_links = (offsets, self.targets[order])
+        return self._out_links
+
+    def propagate(self, rank, start=0, stop=None):
+        """
+        Returns the rank each page receives over its incoming links, with
+        every page splitting its own rank evenly across its outgoing links.
+        With `start` and `stop`, only pages in that range are computed.
+        """
+        if stop is None:
+            stop = len(self.pages)
+        share = np.divide(
+            rank, self.out_degree,
+            out=np.zeros(len(self.pages)), where=self.out_degree > 0)
+        incoming = self._incoming(share, start, stop)
+        return spread_dangling(
+            rank, rank[self.dangling].sum(), self.dangling, start, stop, incoming)
+
+    def propagate_block(self, ranks):
+        """
+        Returns propagate for each row of an (m, N) block of rank vectors.
+        Shares and dangling mass are computed for the whole block at once;
+        the links are gathered once per row, which measured faster than a
+        single (m, links) gather and reduce.
+        """
+        share = np.divide(
+            ranks, self.out_degree,
+            out=np.zeros(ranks.shape), where=self.out_degree > 0)
+        incoming = np.empty(ranks.shape)
+        for row in range(len(ranks)):
+            incoming[row] = self._incoming(share[row], 0, len(self.pages))
+        mass = ranks[:, self.dangling].sum(axis=1)
+        return spread_dangling(ranks, mass, self.dangling, 0, len(self.pages), incoming)
+
+    def _incoming(self, share, start, stop):
+        lo, hi = self.in_offsets[start], self.in_offsets[stop]
+        incoming = np.bincount(
+            self.targets[lo:hi] - start, weights=share[self.sources[lo:hi]],
+            minlength=stop - start)
+        # bincount returns integers when there are no links
+        return incoming.astype(float, copy=False)
+
+    def to_dict(self, rank):
+        """
+        Returns a rank vector as a dict keyed by page name.
+        """
+        return {page: float(value) for page, value in zip(self.pages, rank)}
+
+
+def spread_dangling(rank, mass, dangling, start, stop, out):
+    """
+    Adds to `out` the share pages in start..stop-1 receive of `mass`,
+    the total rank of the pages flagged in `dangling`, which each spread
+    their rank evenly over every page but themselves. Returns `out`.
+    """
+    n = len(dangling)
+    if n < 2:
+        return out
+    out += np.expand_dims(mass, -1) / (n - 1)
+    dangling = np.flatnonzero(dangling[start:stop])
+    out[..., dangling] -= rank[..., start + dangling] / (n - 1)
+    return out
+
+
+def solve(graph, damping_factor, method="jacobi", tolerance=0.005, norm="linf",
+          max_iterations=None, rank=None):
+    """
+    Returns a Solution with the PageRank vector of `graph`, iterating
+    with a method from SOLVERS from `rank` (uniform ranks by default)
+    until the change in ranks, measured by a norm from NORMS, is at most
+    `tolerance`, or `max_iterations` have been run.
+    """
+    if method not in SOLVERS:
+        raise ValueError(f"unknown solver: {method}")
+    if norm not in NORMS:
+        raise ValueError(f"unknown norm: {norm}")
+
+    n = len(graph)
+    if rank is None:
+        rank = np.full(n, 1 / n)
+    history = [rank]
+    iterations = 0
+    while True:
+        if method == "gauss-seidel":
+            new_rank = gauss_seidel_sweep(graph, damping_factor, rank)
+        else:
+            new_rank = (1 - damping_factor) / n + damping_factor * graph.propagate(rank)
+        iterations += 1
+        change = np.abs(new_rank - rank)
+        residual = change.sum() if norm == "l1" else change.max()
+        if residual <= tolerance or iterations == max_iterations:
+            return Solution(new_rank / new_rank.sum(), iterations, float(residual))
+
+        if method in ("aitken", "quadratic"):
+            history = history[-3:] + [new_rank]
+            if iterations % EXTRAPOLATION_PERIOD == 0:
+                if method == "aitken":
+                    new_rank = aitken_extrapolation(*history[-3:])
+                else:
+                    new_rank = quadratic_extrapolation(*history)
+                history = [new_rank]
+        rank = new_rank
+
+
+def personalized_iteration(graph, damping_factor, teleport, tolerance=1e-6,
+                           norm="l1", max_iterations=None):
+    """
+    Returns a Solution with personalized PageRank vectors of `graph` for
+    each row of `teleport`, an (m, N) block of teleport distributions,
+    iterating all rows together until every row's change under `norm`
+    is at most `tolerance`.
+    """
+    if norm not in NORMS:
+        raise ValueError(f"unknown norm: {norm}")
+    teleport = np.asarray(teleport, dtype=float)
+    ranks = teleport.copy()
+    residuals = np.full(len(ranks), np.inf)
+    # Rows still iterating; converged rows are left out of later passes
+    active = np.arange(len(ranks))
+    iterations = 0
+    while len(active) and iterations != max_iterations:
+        block = ranks if len(active) == len(ranks) else ranks[active]
+        new_block = graph.propagate_block(block)
+        new_block *= damping_factor
+        new_block += (1 - damping_factor) * teleport[active]
+        iterations += 1
+        change = np.abs(new_block - block)
+        residuals[active] = change.sum(axis=1) if norm == "l1" else change.max(axis=1)
+        ranks[active] = new_block
+        active = active[residuals[active] > tolerance]
+    ranks /= ranks.sum(axis=1, keepdims=True)
+    return Solution(ranks, iterations, float(residuals.max()))
+
+
+def gauss_seidel_sweep(graph, damping_factor, rank, blocks=GAUSS_SEIDEL_BLOCKS):
+    """
+    Returns `rank` after one Gauss-Seidel sweep, updating blocks of pages
+    in index order so that each block sees the ranks already updated.
+    The result is renormalized, as a sweep does not preserve total rank.
+    """
+    n = len(graph)
+    rank = rank.copy()
+    share = np.divide(rank, graph.out_degree, out=np.zeros(n), where=graph.out_degree > 0)
+    bounds = np.linspace(0, n, min(n, blocks) + 1).astype(int)
+    mass = rank[graph.dangling].sum()
+    for start, stop in zip(bounds[:-1], bounds[1:]):
+        incoming = spread_dangling(
+            rank, mass, graph.dangling, start, stop, graph._incoming(share, start, stop))
+        dangling = graph.dangling[start:stop]
+        mass -= rank[start:stop][dangling].sum()
+        rank[start:stop] = (1 - damping_factor) / n + damping_factor * incoming
+        mass += rank[start:stop][dangling].sum()
+        degree = graph.out_degree[start:stop]
+        np.divide(rank[start:stop], degree, out=share[start:stop], where=degree > 0)
+    return rank / rank.sum()
+
+
+def aitken_extrapolation(x0, x1, x2):
+    """
+    Returns the page-wise Aitken delta-squared extrapolation of three
+    successive iterates, keeping `x2` where it is ill-conditioned.
+    """
+    delta = x2 - x1
+    second = delta - (x1 - x0)
+    safe = np.abs(second) > 1e-15
+    result = x2.copy()
+    result[safe] = x2[safe] - delta[safe] ** 2 / second[safe]
+    result[result < 0] = x2[result < 0]
+    return result / result.sum()
+
+
+def quadratic_extrapolation(x0, x1, x2, x3):
+    """
+    Returns the quadratic extrapolation of four successive iterates
+    (Kamvar et al., 2003), fitting the iterates to the two largest
+    non-principal eigenvectors and eliminating them.
+    """
+    y = np.column_stack([x1 - x0, x2 - x0])
+    gamma, *_ = np.linalg.lstsq(y, -(x3 - x0), rcond=None)
+    beta = [gamma[0] + gamma[1] + 1, gamma[1] + 1, 1]
+    result = beta[0] * x1 + beta[1] * x2 + beta[2] * x3
+    if np.any(result < 0):
+        return x3
+    return result / result.sum()
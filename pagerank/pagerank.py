@@ -1,51 +1,115 @@
-import os
-import random
-import re
-import sys
+import argparse
+
+import numpy as np
+
+from crawler import crawl_graph, crawl_links
+from edgefile import STREAM_SOLVERS, EdgeFile, write_edge_file
+from linkcache import load_ranks, write_ranks
+from linkgraph import (
+    NORMS, SOLVERS, LinkGraph, personalized_iteration, solve
+)
+from sampling import parallel_sample_ranks, sample_ranks
 
 DAMPING = 0.85
 SAMPLES = 100000
+CONVERGENCE = 0.005
 
 
 def main():
-    if len(sys.argv) != 2:
-        sys.exit("Usage: python pagerank.py corpus")
-    corpus = crawl(sys.argv[1])
-    ranks = sample_pagerank(corpus, DAMPING, SAMPLES)
-    print(f"PageRank Results from Sampling (n = {SAMPLES})")
+    parser = argparse.ArgumentParser()
+    parser.add_argument("corpus")
+    parser.add_argument("--samples", type=int, default=SAMPLES)
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--workers", type=int,
+                        help="sample in parallel batches across processes")
+    parser.add_argument("--tolerance", type=float,
+                        help="stop sampling once standard errors are below this")
+    parser.add_argument("--incremental", action="store_true",
+                        help="warm-start iteration from the ranks saved in the corpus")
+    parser.add_argument("--method", choices=SOLVERS, default="jacobi")
+    parser.add_argument("--norm", choices=NORMS, default="linf")
+    parser.add_argument("--convergence", type=float, default=CONVERGENCE,
+                        help="stop iterating once ranks change by at most this")
+    parser.add_argument("--max-iterations", type=int)
+    parser.add_argument("--personalize", nargs="+", action="append", metavar="PAGE",
+                        help="also rank pages for a teleport set of these pages; repeatable")
+    parser.add_argument("--top", type=int, default=5,
+                        help="pages to list per personalized ranking")
+    parser.add_argument("--out-of-core", action="store_true",
+                        help="only iterate, streaming links from an edge file on disk")
+    args = parser.parse_args()
+    if args.out_of_core and args.method not in STREAM_SOLVERS:
+        parser.error(f"--out-of-core needs one of --method {', '.join(STREAM_SOLVERS)}")
+
+    if args.out_of_core:
+        stats = {}
+        ranks = stream_pagerank(
+            args.corpus, DAMPING, args.method, args.convergence, args.norm,
+            args.max_iterations, stats)
+        print(f"PageRank Results from Iteration")
+        for page in sorted(ranks):
+            print(f"  {page}: {ranks[page]:.4f}")
+        print(f"  {stats['iterations']} iterations, "
+              f"final {args.norm} residual {stats['residual']:.2e}")
+        return
+
+    graph = crawl_graph(args.corpus)
+    if args.workers or args.tolerance:
+        estimate, errors, samples = parallel_sample_ranks(
+            graph, DAMPING, args.samples, args.workers, args.seed, args.tolerance)
+        ranks = graph.to_dict(estimate)
+    else:
+        ranks = sample_pagerank(graph, DAMPING, args.samples, seed=args.seed)
+        samples = args.samples
+    print(f"PageRank Results from Sampling (n = {samples})")
     for page in sorted(ranks):
         print(f"  {page}: {ranks[page]:.4f}")
-    ranks = iterate_pagerank(corpus, DAMPING)
+    if args.workers or args.tolerance:
+        print(f"  Largest standard error: {errors.max():.6f}")
+    stats = {}
+    if args.incremental:
+        previous = load_ranks(args.corpus) or {}
+        ranks = update_pagerank(
+            graph, DAMPING, {}, previous, args.method, args.convergence, args.norm,
+            args.max_iterations, stats)[1]
+        write_ranks(ranks, args.corpus)
+    else:
+        ranks = iterate_pagerank(
+            graph, DAMPING, args.method, args.convergence, args.norm,
+            args.max_iterations, stats)
     print(f"PageRank Results from Iteration")
     for page in sorted(ranks):
         print(f"  {page}: {ranks[page]:.4f}")
+    print(f"  {stats['iterations']} iterations, "
+          f"final {args.norm} residual {stats['residual']:.2e}")
+    if args.personalize:
+        results = personalized_pagerank(graph, DAMPING, args.personalize, args.top)
+        for seed, top in zip(args.personalize, results):
+            print(f"Personalized PageRank for {', '.join(seed)}")
+            for page, rank in top:
+                print(f"  {page}: {rank:.4f}")
 
 
-def crawl(directory):
+def crawl(directory, cache=True):
     """
     Parse a directory of HTML pages and check for links to other pages.
     Return a dictionary where each key is a page, and values are
     a list of all other pages in the corpus that are linked to by the page.
-    """
-    pages = dict()
 
-    # Extract all links from HTML files
-    for filename in os.listdir(directory):
-        if not filename.endswith(".html"):
-            continue
-        with open(os.path.join(directory, filename)) as f:
-            contents = f.read()
-            links = re.findall(r"<a\s+(?:[^>]*?)href=\"([^\"]*)\"", contents)
-            pages[filename] = set(links) - {filename}
+    Pages are read and scanned concurrently by crawler.crawl_links; with
+    `cache`, only pages changed since the last crawl are re-read.
+    """
+    return dict(crawl_links(directory, cache=cache))
 
-    # Only include links to other pages in the corpus
-    for filename in pages:
-        pages[filename] = set(
-            link for link in pages[filename]
-            if link in pages
-        )
 
-    return pages
+def link_graph(corpus):
+    """
+    Returns `corpus` as a LinkGraph, building one if it is a dict of
+    link sets rather than a LinkGraph already.
+    """
+    if isinstance(corpus, LinkGraph):
+        return corpus
+    return LinkGraph.from_corpus(corpus)
 
 
 def transition_model(corpus, page, damping_factor):
@@ -67,7 +131,8 @@ def transition_model(corpus, page, damping_factor):
     return model
 
 
-def sample_pagerank(corpus, damping_factor, n):
+def sample_pagerank(corpus, damping_factor, n, seed=None, workers=None,
+                    tolerance=None):
     """
     Return PageRank values for each page by sampling `n` pages
     according to transition model, starting with a page at random.
@@ -75,17 +140,23 @@ def sample_pagerank(corpus, damping_factor, n):
     Return a dictionary where keys are page names, and values are
     their estimated PageRank value (a value between 0 and 1). All
     PageRank values should sum to 1.
+
+    Many walkers are advanced at once over integer link arrays; pass
+    `seed` for reproducible results. `corpus` may also be a LinkGraph,
+    such as crawler.crawl_graph builds. With `workers` or `tolerance`,
+    batches of walkers run in a process pool, stopping early once every
+    page's standard error is below `tolerance`.
     """
-    rank = {k: 0 for k in corpus.keys()}
-    page = random.choice(list(corpus.keys()))
-    for i in range(n):
-        model = transition_model(corpus, page, damping_factor)
-        page = random.choices(list(model.keys()), list(model.values()), k=1)[0]
-        rank[page] += 1 / n
-    return rank
+    graph = link_graph(corpus)
+    if workers is None and tolerance is None:
+        return graph.to_dict(sample_ranks(graph, damping_factor, n, seed=seed))
+    ranks, _, _ = parallel_sample_ranks(
+        graph, damping_factor, n, workers, seed, tolerance)
+    return graph.to_dict(ranks)
 
 
-def iterate_pagerank(corpus, damping_factor):
+def iterate_pagerank(corpus, damping_factor, method="jacobi", tolerance=CONVERGENCE,
+                     norm="linf", max_iterations=None, stats=None):
     """
     Return PageRank values for each page by iteratively updating
     PageRank values until convergence.
@@ -93,43 +164,131 @@ def iterate_pagerank(corpus, damping_factor):
     Return a dictionary where keys are page names, and values are
     their estimated PageRank value (a value between 0 and 1). All
     PageRank values should sum to 1.
+
+    `method` is one of linkgraph.SOLVERS, and iteration stops once the
+    change in ranks under `norm` is at most `tolerance`, or after
+    `max_iterations`. A dict passed as `stats` is filled in with the
+    number of iterations and the final residual. `corpus` may also be
+    a LinkGraph.
+    """
+    graph = link_graph(corpus)
+    solution = solve(graph, damping_factor, method, tolerance, norm, max_iterations)
+    if stats is not None:
+        stats["iterations"] = solution.iterations
+        stats["residual"] = solution.residual
+    return graph.to_dict(solution.rank)
+
+
+def stream_pagerank(directory, damping_factor, method="jacobi", tolerance=CONVERGENCE,
+                    norm="linf", max_iterations=None, stats=None):
+    """
+    Return PageRank values for the pages in `directory` as
+    iterate_pagerank does, without building the corpus in memory.
+
+    The crawl is written to a sorted edge file in `directory`, and each
+    iteration streams the links from it, so memory holds only rank
+    vectors and per-page counts. `method` is one of
+    edgefile.STREAM_SOLVERS, as Gauss-Seidel sweeps need the links in
+    memory.
     """
-    rank = {k: 1 / len(corpus) for k in corpus.keys()}
-    for page in corpus.keys():
-        links = corpus[page]
-        # print(f'p={page}, l = {list(links)}')
-        if len(links) == 0:
-            links = set()
-            for other_page in corpus.keys():
-                if page != other_page:
-                    links.add(other_page)
-            corpus[page] = links
-
-    stable = False
-    while not stable:
-        stable = True
-        tmp_rank = rank.copy()
-        for page in corpus.keys():
-            assert (0 <= rank[page] <= 1)
-            new_rank = 0
-            for ref_page in corpus.keys():
-                if page not in corpus[ref_page]:
-                    continue
-                else:
-                    num_links = len(corpus[ref_page])
-                    contr_rank = damping_factor * rank[ref_page] / num_links
-                    new_rank += contr_rank
-                    # print(f'{page}<-{ref_page}:{num_links},{rank[ref_page]},{contr_rank}')
-            new_rank += (1 - damping_factor) / len(corpus)
-            # print(f'{page} being assigned {new_rank}')
-
-            rank_delta = rank[page] - new_rank
-            if rank_delta > 0.005 or rank_delta < -0.005:
-                stable = False
-            tmp_rank[page] = new_rank
-        rank = tmp_rank.copy()
-        # print(f'Ranks after iteration: {list(rank.values())}')
-    return rank
+    if method not in STREAM_SOLVERS:
+        raise ValueError(f"solver cannot stream an edge file: {method}")
+    edges = EdgeFile(write_edge_file(directory))
+    solution = solve(edges, damping_factor, method, tolerance, norm, max_iterations)
+    if stats is not None:
+        stats["iterations"] = solution.iterations
+        stats["residual"] = solution.residual
+    return edges.to_dict(solution.rank)
+
+
+def personalized_pagerank(corpus, damping_factor, seeds, k=10, tolerance=1e-6):
+    """
+    Return the top `k` pages for each seed in `seeds`, ranked by PageRank
+    that teleports to the seed's pages instead of to any page. A seed is
+    an iterable of pages, teleported to evenly, or a dict mapping pages
+    to teleport weights.
+
+    All seeds are iterated together, sharing the per-iteration work on
+    out-degrees, dangling mass and teleport, though the links are still
+    gathered once per seed; rows stop once their ranking changes by at
+    most `tolerance` in L1 norm. Return
+    a list with a list of (page, rank) pairs, best first, for each seed.
+    `corpus` may also be a LinkGraph.
+    """
+    graph = link_graph(corpus)
+    teleport = np.zeros((len(seeds), len(graph)))
+    for row, seed in enumerate(seeds):
+        weights = seed if isinstance(seed, dict) else dict.fromkeys(seed, 1)
+        for page, weight in weights.items():
+            if page not in graph.index:
+                raise ValueError(f"unknown page: {page}")
+            teleport[row, graph.index[page]] = weight
+        total = teleport[row].sum()
+        if total <= 0:
+            raise ValueError(f"seed {row} has no teleport weight")
+        teleport[row] /= total
+
+    ranks = personalized_iteration(graph, damping_factor, teleport, tolerance).rank
+    k = min(k, len(graph))
+    results = []
+    for rank in ranks:
+        top = np.argpartition(-rank, k - 1)[:k]
+        top = top[np.argsort(-rank[top], kind="stable")]
+        results.append([(graph.pages[i], float(rank[i])) for i in top])
+    return results
+
+
+def apply_delta(corpus, delta):
+    """
+    Return a copy of `corpus` with `delta` applied, where `delta` maps
+    each changed page to its new set of links, or to None if the page
+    was removed.
+    """
+    corpus = dict(corpus)
+    removed = False
+    for page, links in delta.items():
+        if links is None:
+            removed = corpus.pop(page, None) is not None or removed
+        else:
+            corpus[page] = set(links)
+    if removed:
+        corpus = {
+            page: set(link for link in links if link in corpus)
+            for page, links in corpus.items()
+        }
+    return corpus
+
+
+def update_pagerank(corpus, damping_factor, delta, ranks, method="jacobi",
+                    tolerance=CONVERGENCE, norm="linf", max_iterations=None,
+                    stats=None):
+    """
+    Apply `delta` to `corpus` as in apply_delta, and return the new
+    corpus with its PageRank values, solved as in iterate_pagerank but
+    warm-started from `ranks`, the values for the corpus before the
+    change; pages without a previous rank start at 0.
+
+    A LinkGraph passed as `corpus` is patched with LinkGraph.apply_delta
+    instead of being rebuilt, and the patched graph is returned. Starting
+    close to the answer, a small edit converges in fewer iterations than
+    a run from uniform ranks, but each iteration still covers every link.
+    """
+    if isinstance(corpus, LinkGraph):
+        corpus = graph = corpus.apply_delta(delta)
+    else:
+        corpus = apply_delta(corpus, delta)
+        graph = LinkGraph.from_corpus(corpus)
+    start = None
+    if ranks:
+        start = np.fromiter(
+            (ranks.get(page, 0) for page in graph.pages), dtype=float, count=len(graph))
+        start = start / start.sum() if start.sum() > 0 else None
+    solution = solve(
+        graph, damping_factor, method, tolerance, norm, max_iterations, start)
+    if stats is not None:
+        stats["iterations"] = solution.iterations
+        stats["residual"] = solution.residual
+    return corpus, graph.to_dict(solution.rank)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,154 @@
+import multiprocessing
+import os
+
+import numpy as np
+
+# Walkers advanced together by default
+WALKERS = 4096
+
+# Steps each walker takes before its visits are counted, so that counts
+# are not biased towards the uniform start; its bias shrinks as
+# damping_factor ** BURN_IN
+BURN_IN = 64
+
+# Fewest counted steps per walker; fewer walkers are used for small `n`
+MIN_STEPS = 32
+
+# Largest batch of samples drawn by one worker task
+MAX_BATCH = 1000000
+
+# Fewest batches in a round; standard errors from fewer are unreliable
+MIN_BATCHES = 16
+
+# With a tolerance, samples are split into this many rounds of batches,
+# so that sampling can stop after any of them
+TOLERANCE_ROUNDS = 8
+
+# LinkGraph sampled by forked workers; set by parallel_sample_ranks
+_graph = None
+
+
+def random_walk_counts(graph, damping_factor, n, walkers=WALKERS, rng=None,
+                       burn_in=BURN_IN):
+    """
+    Returns an array counting how often each page of a LinkGraph is
+    visited over `n` random-surfer steps, taken by `walkers` independent
+    walkers that each start on a random page and take `burn_in` steps
+    before their visits are counted. Each walker takes at least
+    MIN_STEPS counted steps, so `walkers` is reduced for small `n`.
+
+    At each step a walker follows a random link with probability
+    `damping_factor`, and otherwise jumps to a page chosen uniformly
+    from the whole corpus. A page without links counts as linking to
+    every other page, as in LinkGraph.
+    """
+    rng = rng or np.random.default_rng()
+    pages = len(graph)
+    offsets, link_targets = graph.out_links()
+    link_count = np.where(graph.dangling, 0, graph.out_degree)
+    # Padded so that pages without links still index a valid entry
+    link_targets = np.append(link_targets, 0)
+    any_dangling = pages > 1 and graph.dangling.any()
+
+    walkers = max(1, min(walkers, n // MIN_STEPS))
+    position = rng.integers(pages, size=walkers)
+    counts = np.zeros(pages, dtype=np.int64)
+    remaining = n
+    steps = 0
+    while remaining > 0:
+        # Teleport coin, then a uniform link choice for the followers
+        follow = rng.random(walkers) < damping_factor
+        jump = rng.integers(pages, size=walkers)
+        choice = offsets[position] + (
+            rng.random(walkers) * link_count[position]).astype(np.int64)
+        target = link_targets[choice]
+        if any_dangling:
+            # Followers on dangling pages move to any other page
+            other = rng.integers(pages - 1, size=walkers)
+            other += other >= position
+            target = np.where(link_count[position] > 0, target, other)
+        position = np.where(follow, target, jump)
+        steps += 1
+        if steps <= burn_in:
+            continue
+
+        counted = position[:remaining]
+        counts += np.bincount(counted, minlength=pages)
+        remaining -= len(counted)
+    return counts
+
+
+def sample_ranks(graph, damping_factor, n, walkers=WALKERS, seed=None):
+    """
+    Returns PageRank estimates for a LinkGraph from `n` random-surfer
+    samples, reproducible for a given `seed`.
+    """
+    rng = np.random.default_rng(seed)
+    counts = random_walk_counts(graph, damping_factor, n, walkers, rng)
+    return counts / counts.sum()
+
+
+def _walk_batch(task):
+    seed, damping_factor, n, walkers = task
+    rng = np.random.default_rng(seed)
+    return random_walk_counts(_graph, damping_factor, n, walkers, rng)
+
+
+def parallel_sample_ranks(graph, damping_factor, n, workers=None, seed=None,
+                          tolerance=None, walkers=WALKERS):
+    """
+    Returns (ranks, standard_errors, samples) for a LinkGraph, estimated
+    from up to `n` random-surfer samples split into independently seeded
+    batches run across `workers` processes; `samples` is the number
+    actually drawn.
+
+    Batches run in rounds of at least MIN_BATCHES and one per worker,
+    with TOLERANCE_ROUNDS rounds when `tolerance` is set, and none is
+    larger than MAX_BATCH. Standard errors come from the spread of the
+    per-batch estimates. With `tolerance`, sampling stops early after
+    the first round in which every page's standard error is below it.
+    """
+    global _graph
+    _graph = graph
+    workers = workers or os.cpu_count()
+    round_size = max(workers, MIN_BATCHES)
+    rounds = TOLERANCE_ROUNDS if tolerance is not None else 1
+    count = min(n, max(round_size * rounds, -(-n // MAX_BATCH)))
+    batches = [n // count + (i < n % count) for i in range(count)]
+    seeds = np.random.SeedSequence(seed).spawn(len(batches))
+    tasks = [
+        (seeds[i], damping_factor, size, walkers) for i, size in enumerate(batches)
+    ]
+
+    context = multiprocessing.get_context("fork")
+    with context.Pool(workers) as pool:
+        counts = np.zeros(len(graph), dtype=np.int64)
+        estimates = []
+        sizes = []
+        # Submit a round of batches at a time, checking the error after each
+        for start in range(0, len(tasks), round_size):
+            round_tasks = tasks[start:start + round_size]
+            for (_, _, size, _), batch_counts in zip(
+                    round_tasks, pool.map(_walk_batch, round_tasks)):
+                counts += batch_counts
+                estimates.append(batch_counts / size)
+                sizes.append(size)
+            errors = standard_errors(estimates, sizes)
+            if tolerance is not None and len(estimates) > 1 and errors.max() < tolerance:
+                break
+
+    return counts / counts.sum(), errors, int(sum(sizes))
+
+
+def standard_errors(estimates, sizes):
+    """
+    Returns the per-page standard error of the size-weighted mean of
+    per-batch estimates, or infinity with fewer than two batches.
+    """
+    if len(estimates) < 2:
+        return np.full(len(estimates[0]), np.inf)
+    estimates = np.array(estimates)
+    weights = np.array(sizes, dtype=float) / sum(sizes)
+    mean = weights @ estimates
+    variance = weights @ (estimates - mean) ** 2 / (1 - (weights ** 2).sum())
+    return np.sqrt(variance * (weights ** 2).sum())